@@ -17,6 +17,9 @@ from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment overrides before any setting reads them
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -76,13 +79,124 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=sqlite (default) keeps the single-file database, DB_ENGINE=postgresql
+# switches to PostgreSQL configured by the POSTGRES_* variables.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+# Seconds to keep a connection open between requests (0 closes it after every
+# request). Stale connections are pinged before reuse.
+CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'fridgventory'),
+            'USER': os.environ.get('POSTGRES_USER', 'fridgventory'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+    if DB_POOL_MAX_SIZE:
+        # Needs psycopg[pool], which is not in requirements.txt; a pool replaces
+        # persistent connections
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    # WAL lets readers continue while one connection writes, and with
+    # synchronous=NORMAL a commit no longer waits for a full fsync. Writers
+    # queue for busy_timeout milliseconds instead of failing with "database is
+    # locked"; IMMEDIATE transactions take the write lock up front so a read
+    # that later writes cannot deadlock against another writer.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+        # Negative values are in KiB
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -32000)),
+        'temp_store': 'MEMORY',
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The default per-process memory cache can be swapped for a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) through the environment.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fridgventory'),
     }
 }
 
+if CACHE_BACKEND.endswith('LocMemCache'):
+    # Room for per-row fragments of a few thousand items in both languages
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 20000}
+
+# Rendered pages and item rows are keyed by the inventory version, so this only
+# bounds how long unused entries stay around. Set to 0 to disable page caching.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 3600))
+
+
+# AI assistant
+# Inventories larger than this are narrowed down to the best matching items
+# before they are put into the prompt.
+
+AI_MAX_CANDIDATES = int(os.environ.get('AI_MAX_CANDIDATES', 40))
+
+# Seconds to wait for the model server to accept a connection, and for its answer
+AI_CONNECT_TIMEOUT = float(os.environ.get('AI_CONNECT_TIMEOUT', 5))
+AI_READ_TIMEOUT = float(os.environ.get('AI_READ_TIMEOUT', 60))
+
+# Utterances the local parser reads with at least this confidence (0-1) are
+# answered without the model; set above 1 to always ask the model.
+AI_OFFLINE_MIN_CONFIDENCE = float(os.environ.get('AI_OFFLINE_MIN_CONFIDENCE', 0.75))
+
+# Constrain the model to the suggestion JSON schema (Ollama "format", Gemini
+# response_schema); turn off for models that do not support it.
+AI_STRUCTURED_OUTPUT = os.environ.get('AI_STRUCTURED_OUTPUT', '1') == '1'
+
+# Parsed answers are cached under the item version stamp: 'memory' per process,
+# 'shared' in the cache above (use a shared CACHE_BACKEND), or 'off'.
+AI_RESPONSE_CACHE = os.environ.get('AI_RESPONSE_CACHE', 'memory').lower()
+AI_RESPONSE_CACHE_SIZE = int(os.environ.get('AI_RESPONSE_CACHE_SIZE', 256))
+AI_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('AI_RESPONSE_CACHE_TIMEOUT', 600))
+
+# The consume page queues analyses for 'manage.py run_ai_worker', which runs
+# this many at a time. Jobs running longer than AI_JOB_STALE_AFTER seconds are
+# assumed lost with their worker and queued again; finished jobs are deleted
+# after AI_JOB_RETENTION seconds.
+AI_WORKER_CONCURRENCY = int(os.environ.get('AI_WORKER_CONCURRENCY', 4))
+AI_WORKER_POLL_INTERVAL = float(os.environ.get('AI_WORKER_POLL_INTERVAL', 1))
+AI_JOB_STALE_AFTER = int(os.environ.get('AI_JOB_STALE_AFTER', 300))
+AI_JOB_RETENTION = int(os.environ.get('AI_JOB_RETENTION', 86400))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,8 +236,6 @@ AUTH_PASSWORD_VALIDATORS = [
 #         print(f"Error loading env file: {e}")
 #         exit(1)
 
-load_dotenv(BASE_DIR / '.env')
-
 LANGUAGE_CODE = os.environ.get('DEFAULT_LANGUAGE', 'en')
 
 LANGUAGES = [
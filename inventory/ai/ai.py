@@ -1,73 +1,70 @@
+import asyncio
 from io import BytesIO
 import os
 import pprint as pp
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple
 import json
 
+from asgiref.sync import sync_to_async
+
 from django.db.models import QuerySet
 from django.http import FileResponse, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.translation import gettext as _
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 import json
-import requests
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
 # Google Gemini imports
-from google import genai
 from google.genai import types
 
 from inventory.models import Item
 
+from inventory import versioning
 
+from . import clients, offline, prompts, response_cache, retrieval, streaming, structured
 
 
 
-def _get_prompt_for_language(language: str) -> str:
-    """Load the appropriate prompt file based on language."""
-    if language == "cs":
-        prompt_file = "prompts/cs_consumtion_analysis.txt"
-    else:
-        prompt_file = "prompts/en_consumtion_analysis.txt"
-    
-    try:
-        with open(prompt_file, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        # Fallback to a basic prompt if file doesn't exist
-        return """
-        Based on the inventory and consumed items, identify which items should be removed from inventory.
-        Return a JSON response with the following format:
-        {
-            "consumed_items": [
-                {
-                    "item_id": 1,
-                    "item_name": "item_name",
-                    "missing_quantity": 10
-                }
-            ]
-        }
-        """
 
 
-def _call_ollama_api(prompt: str) -> str:
-    """Call Ollama API with the given prompt."""
+def _get_prompt_for_language(language: str) -> prompts.PromptTemplate:
+    """Return the cached consumption analysis template for the language."""
+    return prompts.get_prompt(prompts.CONSUMPTION_ANALYSIS, language)
+
+
+def _model_name(provider: str) -> str:
+    if provider == "gemini":
+        return os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+    return os.getenv("OLLAMA_MODEL", "llama3")
+
+
+async def _call_ollama_api(prompt: str, system: str = "") -> str:
+    """Call Ollama API with the given prompt.
+
+    ``system`` is the static part of the prompt; sent unchanged on every call
+    it lets Ollama reuse the evaluated prefix.
+    """
     OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/generate")
     
     payload = {
-        "model": os.getenv("OLLAMA_MODEL", "llama3"),
+        "model": _model_name("ollama"),
         "prompt": prompt,
         "stream": False,
     }
+    if system:
+        payload["system"] = system
+    if structured.enabled():
+        payload["format"] = structured.CONSUMED_SCHEMA
     
     print("Calling Ollama with payload:")
     pp.pp(payload)
     
-    response = requests.post(OLLAMA_API_URL, json=payload, timeout=60)
+    response = await clients.http_client().post(OLLAMA_API_URL, json=payload)
     response.raise_for_status()
     
     raw_response = response.json()['response']
@@ -77,23 +74,32 @@ def _call_ollama_api(prompt: str) -> str:
     return raw_response
 
 
-def _call_gemini_api(prompt: str) -> str:
+def _gemini_config(system: str = "") -> types.GenerateContentConfig:
+    schema = {}
+    if structured.enabled():
+        schema = {"response_mime_type": "application/json", "response_schema": structured.CONSUMED_SCHEMA}
+    return types.GenerateContentConfig(
+        system_instruction=system or None,
+        thinking_config=types.ThinkingConfig(thinking_budget=0),  # Disables thinking
+        **schema,
+    )
+
+
+async def _call_gemini_api(prompt: str, system: str = "") -> str:
     """Call Gemini API with the given prompt."""
     try:
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        client = clients.gemini_client()
         
-        model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+        model = _model_name("gemini")
         
         print(f"Calling Gemini model: {model}")
         print("Prompt:")
         print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
         
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=model,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0)  # Disables thinking
-            ),
+            config=_gemini_config(system),
         )
         
         raw_response = response.text
@@ -107,45 +113,233 @@ def _call_gemini_api(prompt: str) -> str:
         raise
 
 
-def _parse_llm_response(raw_response: str) -> list:
-    """Parse the LLM response and extract consumed items."""
+async def _stream_ollama_api(prompt: str, system: str = "") -> AsyncIterator[str]:
+    """Yield the text of Ollama's NDJSON stream as it is generated."""
+    OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/generate")
+
+    payload = {
+        "model": _model_name("ollama"),
+        "prompt": prompt,
+        "stream": True,
+    }
+    if system:
+        payload["system"] = system
+    if structured.enabled():
+        payload["format"] = structured.CONSUMED_SCHEMA
+
+    async with clients.http_client().stream("POST", OLLAMA_API_URL, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+
+
+async def _stream_gemini_api(prompt: str, system: str = "") -> AsyncIterator[str]:
+    """Yield the text of Gemini's streamed answer as it is generated."""
+    stream = await clients.gemini_client().aio.models.generate_content_stream(
+        model=_model_name("gemini"),
+        contents=prompt,
+        config=_gemini_config(system),
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+
+PROVIDERS = {
+    "ollama": _call_ollama_api,
+    "gemini": _call_gemini_api,
+}
+
+STREAMING_PROVIDERS = {
+    "ollama": _stream_ollama_api,
+    "gemini": _stream_gemini_api,
+}
+
+# A streamed generation is abandoned after this much text without a JSON
+# object, or after this many entries naming items that were not offered
+MAX_PREAMBLE = 2000
+MAX_UNKNOWN_ITEMS = 3
+
+
+async def _named_suggestions(entries: List[dict]) -> List[dict]:
+    """``[{id, name, consumed}]`` for the entries whose item exists."""
+    # Map item_id to the consumed quantity from the AI response
+    consumed_map = {entry["id"]: entry["consumed"] for entry in entries}
+    return [
+        {
+            "id": item.id, 
+            "name": item.name, 
+            "consumed": consumed_map.get(item.id, 0)
+        }
+        async for item in Item.objects.filter(id__in=consumed_map).only("id", "name")
+    ]
+
+
+def _provider() -> str:
+    return os.getenv("MODEL_PROVIDER", "ollama").lower()
+
+
+async def _cache_key(user_input: str, language: str, provider: str, template: prompts.PromptTemplate) -> str:
+    return response_cache.make_key(
+        user_input, language, provider, _model_name(provider),
+        await sync_to_async(versioning.get)(versioning.ITEMS), template.mtime,
+    )
+
+
+async def answer_locally(user_input: str, language: str = "en") -> Optional[Tuple[List[dict], str]]:
+    """The suggestions of ``suggest_consumed`` if they need no model call, else None.
+
+    That is when the local parser is confident (``"offline"``) or the same
+    input was answered before (``"hit"``); both take milliseconds.
+    """
+    local = await sync_to_async(offline.parse)(user_input, language)
+    if local.is_confident():
+        return await _named_suggestions(local.entries), "offline"
+
+    model_provider = _provider()
+    if model_provider not in PROVIDERS:
+        return None
+    template = _get_prompt_for_language(language)
+    items_llm = response_cache.responses.get(await _cache_key(user_input, language, model_provider, template))
+    if items_llm is None:
+        return None
+    return await _named_suggestions(items_llm), "hit"
+
+
+class SuggestionError(Exception):
+    """The model could not be used; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+async def suggest_consumed(user_input: str, language: str = "en") -> Tuple[List[dict], str]:
+    """Ask the configured model which items ``user_input`` consumed.
+
+    Returns ``[{id, name, consumed}]`` and where the answer came from:
+    ``"offline"`` (the local parser was confident enough), ``"hit"`` (the
+    response cache) or ``"miss"`` (the model). Database work runs in the sync
+    thread; only the model call is awaited on the event loop, so a slow model
+    does not hold a worker thread. Raises ``SuggestionError``.
+    """
+    # Determine which AI provider to use
+    model_provider = _provider()
+    func_llm = PROVIDERS.get(model_provider)
+    if func_llm is None:
+        raise SuggestionError(f"Unsupported MODEL_PROVIDER: {model_provider}. Use 'ollama' or 'gemini'.", status=400)
+
+    # Simple utterances are read locally, repeated ones come from the cache
+    local = await answer_locally(user_input, language)
+    if local is not None:
+        return local
+
+    # Load the appropriate prompt based on language
+    template = _get_prompt_for_language(language)
+
+    cache_key = await _cache_key(user_input, language, model_provider, template)
+
+    # Only the items the utterance most likely refers to go into the prompt
+    current_inventory = await sync_to_async(retrieval.candidates)(user_input, language)
+
+    # Only the part after the static prefix is built per request
+    prompt = template.render_tail(inventory=json.dumps(current_inventory), user_input=user_input)
+
+    # One call: the schema constrains the output and small defects are repaired locally
+    raw_response = await func_llm(prompt, system=template.prefix)
     try:
-        llm_suggestions = json.loads(raw_response)
-        return llm_suggestions.get("consumed", [])
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        print(f"Raw response: {raw_response}")
-        
-        # Try to extract JSON from the response if it's wrapped in other text
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', raw_response)
-        if json_match:
-            try:
-                llm_suggestions = json.loads(json_match.group())
-                return llm_suggestions.get("consumed", [])
-            except json.JSONDecodeError:
-                pass
-            
-        # Try to add matching parentheses and brackets to the response
-        json_match = re.search(r'\{[\s\S]*\}', raw_response)
-        if json_match:
-            try:
-                llm_suggestions = json.loads(json_match.group())
-                return llm_suggestions.get("consumed", [])
-            except json.JSONDecodeError:
-                pass
-            
-        
-        return []
+        items_llm = structured.parse_consumed(raw_response)
+    except structured.InvalidResponse as e:
+        print(f"LLM returned an unusable response ({e}): {raw_response}")
+        raise SuggestionError("AI failed to provide valid response")
+    response_cache.responses.set(cache_key, items_llm)
+
+    response_data = await _named_suggestions(items_llm)
+    return response_data, "miss"
+
+
+async def stream_consumed(user_input: str, language: str = "en") -> AsyncIterator[Tuple[str, dict]]:
+    """Like ``suggest_consumed`` but yields each suggestion as soon as the model has written it.
+
+    Yields ``("suggestion", {id, name, consumed})`` events followed by one
+    ``("done", {"cache": "offline" | "hit" | "miss"})``. A generation that shows no JSON
+    or keeps naming items that were not offered is aborted early with
+    ``SuggestionError``; there is no retry.
+    """
+    model_provider = _provider()
+    func_stream = STREAMING_PROVIDERS.get(model_provider)
+    if func_stream is None:
+        raise SuggestionError(f"Unsupported MODEL_PROVIDER: {model_provider}. Use 'ollama' or 'gemini'.", status=400)
+
+    local = await answer_locally(user_input, language)
+    if local is not None:
+        suggestions, cache_status = local
+        for suggestion in suggestions:
+            yield "suggestion", suggestion
+        yield "done", {"cache": cache_status}
+        return
+
+    template = _get_prompt_for_language(language)
+    cache_key = await _cache_key(user_input, language, model_provider, template)
+
+    current_inventory = await sync_to_async(retrieval.candidates)(user_input, language)
+    offered = {row["id"]: row["name"] for row in current_inventory}
+    prompt = template.render_tail(inventory=json.dumps(current_inventory), user_input=user_input)
+
+    parser = streaming.ConsumedParser()
+    collected = []
+    seen = set()
+    unknown = 0
+    stream = func_stream(prompt, system=template.prefix)
+    try:
+        async for text in stream:
+            for entry in parser.feed(text):
+                entry = structured.clean_entry(entry)
+                item_id = entry["id"] if entry else None
+                if item_id not in offered:
+                    unknown += 1
+                    if unknown >= MAX_UNKNOWN_ITEMS:
+                        raise SuggestionError("AI response does not match the inventory")
+                    continue
+                collected.append(entry)
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                yield "suggestion", {"id": item_id, "name": offered[item_id], "consumed": entry["consumed"]}
+            if parser.finished:
+                break
+            if not parser.started and parser.text_seen > MAX_PREAMBLE:
+                raise SuggestionError("AI response contains no JSON")
+    finally:
+        # Closing the stream closes the connection, which stops the generation
+        await stream.aclose()
+
+    if not parser.started or (parser.finished and not parser.found):
+        # As structured.parse_consumed, an answer without the entries array is unusable
+        raise SuggestionError("AI failed to provide valid response")
+    if parser.finished:
+        response_cache.responses.set(cache_key, collected)
+    yield "done", {"cache": "miss"}
 
 
 @csrf_exempt
 @require_POST
-def get_consumed_suggestions(request):
+@clients.close_after_wsgi_request
+async def get_consumed_suggestions(request):
     """
     Receives user input about consumed items and uses an LLM
     to suggest inventory items for deletion.
     Supports both Ollama and Gemini APIs based on MODEL_PROVIDER env var.
+
+    Under ASGI a client that disconnects cancels the view, and with it the
+    pending model request.
     """
     try:
         data = json.loads(request.body)
@@ -153,85 +347,23 @@ def get_consumed_suggestions(request):
         if not user_input:
             return JsonResponse({"error": "No user input provided."}, status=400)
 
-        # Get the current inventory as a simple, structured list
-        current_inventory = list(Item.objects.all().values('id', 'name', 'current_quantity'))
-        
-        # Load the appropriate prompt based on language
-        language = data.get("language", "en")
-        base_prompt = _get_prompt_for_language(language)
-        
-        # Craft the complete prompt
-        full_prompt = base_prompt + f"""
-        
-        # Here is my current inventory:
-        {json.dumps(current_inventory)}
-        
-        # Here is the speech of the worker from which you extract the items to be removed from the inventory:
-        {user_input}
-        """
+        response_data, cache_status = await suggest_consumed(user_input, data.get("language", "en"))
 
-        # Determine which AI provider to use
-        model_provider = os.getenv("MODEL_PROVIDER", "ollama").lower()
-        
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            # Call the appropriate API
-            func_llm = None
-            if model_provider == "gemini":
-                func_llm = _call_gemini_api
-            elif model_provider == "ollama":
-                func_llm = _call_ollama_api
-            else:
-                return JsonResponse({
-                    "error": f"Unsupported MODEL_PROVIDER: {model_provider}. Use 'ollama' or 'gemini'."
-                }, status=400)
-            
-            raw_response = func_llm(full_prompt)
-
-            # Parse the response
-            items_llm = _parse_llm_response(raw_response)
-            print(f"DEBUG: raw_response = {raw_response}")
-            print(f"DEBUG: items_llm = {items_llm}, type = {type(items_llm)}")
-            
-            if items_llm and isinstance(items_llm, list):
-                break
-            
-            retry_count += 1
-            print(f"LLM returned an unparseable response (attempt {retry_count}/{max_retries}): {raw_response}")
-            
-
-        # Check if we exhausted retries or got valid data
-        if not items_llm or not isinstance(items_llm, list):
-            print(f"ERROR: Failed to get valid response after {max_retries} attempts. items_llm = {items_llm}, type: {type(items_llm)}")
-            return JsonResponse({"error": "AI failed to provide valid response after multiple attempts"}, status=500)
-        
-        # Fetch the actual Item objects from the database
-        item_ids = []
-        for item_llm in items_llm:
-            if isinstance(item_llm, dict) and "id" in item_llm:
-                item_ids.append(item_llm.get("id"))
-        
-        suggested_items = Item.objects.filter(id__in=item_ids)
-        
-        # Create a mapping of item_id to consumed quantity from AI response
-        consumed_map = {}
-        for item_llm in items_llm:
-            if isinstance(item_llm, dict) and "id" in item_llm and "consumed" in item_llm:
-                consumed_map[item_llm.get("id")] = item_llm.get("consumed", 0)
-
-        response_data = [
-            {
-                "id": item.id, 
-                "name": item.name, 
-                "consumed": consumed_map.get(item.id, 0)
-            }
-            for item in suggested_items
-        ]
-
-        return JsonResponse({"suggestions": response_data})
+        response = JsonResponse({"suggestions": response_data})
+        response["X-AI-Cache"] = cache_status
+        return response
 
+    except asyncio.CancelledError:
+        print("Client disconnected, cancelled the AI request")
+        raise
+    except SuggestionError as e:
+        return JsonResponse({"error": e.message}, status=e.status)
     except Exception as e:
         print(f"Error in get_consumed_suggestions: {e}")
-        return JsonResponse({"error": str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@require_GET
+def ai_cache_stats(request):
+    """Hit and miss counters of the suggestion cache in this process."""
+    return JsonResponse(response_cache.responses.stats())
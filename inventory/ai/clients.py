@@ -0,0 +1,116 @@
+"""Lazily created, pooled HTTP clients for the model providers.
+
+An ``httpx.AsyncClient`` belongs to the event loop it was first used on, so
+one client is kept per running loop. Under ASGI (``uvicorn core.asgi:application``)
+that is a single client whose keep-alive connections are reused by every
+request, and ``run_ai_worker`` keeps one loop per thread. The Gemini client
+sends its requests through the same pool.
+
+Under WSGI (``manage.py runserver``) Django runs each async view on a loop of
+its own; views decorated with ``close_after_wsgi_request`` close that loop's
+clients before it goes away, so nothing is pooled but no connection is left
+open either. Whoever owns a long-lived loop calls ``aclose`` before closing it.
+
+Timeouts come from ``AI_CONNECT_TIMEOUT`` and ``AI_READ_TIMEOUT``: an
+unreachable Ollama fails within the connect timeout instead of holding the
+request for the whole generation budget.
+"""
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from typing import MutableMapping
+
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from google import genai
+from google.genai import types
+
+MAX_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+_http_clients: MutableMapping[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+_gemini_clients: MutableMapping[asyncio.AbstractEventLoop, genai.Client] = weakref.WeakKeyDictionary()
+_lock = threading.RLock()
+
+
+def connect_timeout() -> float:
+    return getattr(settings, "AI_CONNECT_TIMEOUT", 5.0)
+
+
+def read_timeout() -> float:
+    return getattr(settings, "AI_READ_TIMEOUT", 60.0)
+
+
+def timeout() -> httpx.Timeout:
+    return httpx.Timeout(read_timeout(), connect=connect_timeout(), pool=connect_timeout())
+
+
+def http_client() -> httpx.AsyncClient:
+    """The pooled client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        with _lock:
+            client = _http_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    timeout=timeout(),
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                )
+                _http_clients[loop] = client
+    return client
+
+
+def gemini_client() -> genai.Client:
+    """A Gemini client of the running event loop, sending through ``http_client``."""
+    loop = asyncio.get_running_loop()
+    client = _gemini_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _gemini_clients.get(loop)
+            if client is None:
+                client = genai.Client(
+                    api_key=os.getenv("GEMINI_API_KEY"),
+                    http_options=types.HttpOptions(
+                        # The SDK sets a per-request timeout (milliseconds) that
+                        # overrides the pool's; it applies to every phase
+                        timeout=int(read_timeout() * 1000),
+                        httpx_async_client=http_client(),
+                    ),
+                )
+                _gemini_clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the clients of the running event loop and their connections."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _http_clients.pop(loop, None)
+        gemini = _gemini_clients.pop(loop, None)
+    if gemini is not None:
+        await gemini.aio.aclose()
+    if client is not None:
+        await client.aclose()
+
+
+def close_after_wsgi_request(view):
+    """Close the clients an async view opened if it ran on a per-request loop.
+
+    Under ASGI the loop, and so the pool, outlives the request and is kept.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await aclose()
+    return wrapper
@@ -0,0 +1,134 @@
+"""Database-backed queue of consumption analyses.
+
+The consume page submits an ``AIJob`` row and follows it; the model is called
+by ``manage.py run_ai_worker`` in a separate process, so HTTP workers are
+never held by a slow generation and model throughput is scaled by running
+more concurrent jobs per worker or more worker processes.
+
+A worker runs its jobs as tasks on one event loop, so they share the pooled
+model clients of ``clients``. Each suggestion is stored on the job as soon
+as the model has written it, which lets the page show it before the job is
+done.
+
+Input that needs no model (see ``ai.answer_locally``) is answered when the
+job is submitted. Workers claim jobs with a conditional UPDATE, so any
+number of them can share one queue. A job whose worker died is queued again
+once it has been running for ``AI_JOB_STALE_AFTER`` seconds, up to
+``MAX_ATTEMPTS`` times; finished jobs are deleted after ``AI_JOB_RETENTION``.
+"""
+import os
+import socket
+from datetime import timedelta
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from inventory.models import AIJob
+
+from . import ai
+
+MAX_ATTEMPTS = 3
+# How many queued jobs a worker looks at per claim; others may take some of them first
+CLAIM_BATCH = 5
+
+
+def stale_after() -> timedelta:
+    return timedelta(seconds=getattr(settings, "AI_JOB_STALE_AFTER", 300))
+
+
+def retention() -> timedelta:
+    return timedelta(seconds=getattr(settings, "AI_JOB_RETENTION", 86400))
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def submit(user_input: str, language: str = "en") -> AIJob:
+    """Queue an analysis of ``user_input``, or store its answer right away if no model is needed."""
+    local = await ai.answer_locally(user_input, language)
+    if local is None:
+        return await AIJob.objects.acreate(user_input=user_input, language=language)
+    suggestions, source = local
+    now = timezone.now()
+    return await AIJob.objects.acreate(
+        user_input=user_input, language=language, status=AIJob.DONE,
+        suggestions=suggestions, source=source, started_at=now, finished_at=now,
+    )
+
+
+def claim(worker: str = "") -> Optional[AIJob]:
+    """Mark the oldest queued job as running for ``worker`` and return it, None if there is none."""
+    while True:
+        queued = list(
+            AIJob.objects.filter(status=AIJob.QUEUED).order_by("created_at").values_list("id", flat=True)[:CLAIM_BATCH]
+        )
+        if not queued:
+            return None
+        for job_id in queued:
+            claimed = AIJob.objects.filter(id=job_id, status=AIJob.QUEUED).update(
+                status=AIJob.RUNNING, worker=worker, started_at=timezone.now(), attempts=F("attempts") + 1,
+            )
+            if claimed:
+                return AIJob.objects.get(id=job_id)
+
+
+async def run(job: AIJob) -> AIJob:
+    """Ask the model for ``job``, storing each suggestion as it arrives and then the outcome."""
+    suggestions = []
+    source = ""
+    try:
+        async for event, payload in ai.stream_consumed(job.user_input, job.language):
+            if event == "suggestion":
+                suggestions.append(payload)
+                await sync_to_async(_update)(job, suggestions=suggestions)
+            elif event == "done":
+                source = payload["cache"]
+    except ai.SuggestionError as e:
+        await sync_to_async(_update)(job, status=AIJob.FAILED, error=e.message, error_status=e.status)
+    except Exception as e:
+        print(f"AI job {job.id} failed: {e}")
+        await sync_to_async(_update)(job, status=AIJob.FAILED, error=str(e), error_status=500)
+    else:
+        await sync_to_async(_update)(job, status=AIJob.DONE, suggestions=suggestions, source=source)
+    return job
+
+
+def _update(job: AIJob, **fields) -> None:
+    if fields.get("status") in (AIJob.DONE, AIJob.FAILED):
+        fields["finished_at"] = timezone.now()
+    # Only if the job was not given to another worker in the meantime
+    AIJob.objects.filter(id=job.id, status=AIJob.RUNNING, worker=job.worker).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def release(worker: str) -> int:
+    """Put the jobs ``worker`` is stopping without finishing back into the queue.
+
+    The attempt is not counted; partial suggestions are dropped.
+    """
+    return AIJob.objects.filter(status=AIJob.RUNNING, worker=worker).update(
+        status=AIJob.QUEUED, worker="", started_at=None, suggestions=None, attempts=F("attempts") - 1,
+    )
+
+
+def requeue_stale() -> int:
+    """Queue running jobs whose worker went away again, failing those out of attempts."""
+    stale = AIJob.objects.filter(status=AIJob.RUNNING, started_at__lt=timezone.now() - stale_after())
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=AIJob.FAILED, error="AI worker did not finish the analysis", error_status=504,
+        finished_at=timezone.now(),
+    )
+    return stale.update(status=AIJob.QUEUED, worker="", started_at=None, suggestions=None) + failed
+
+
+def purge() -> int:
+    """Delete finished jobs older than the retention period."""
+    deleted, _ = AIJob.objects.filter(
+        status__in=(AIJob.DONE, AIJob.FAILED), finished_at__lt=timezone.now() - retention(),
+    ).delete()
+    return deleted
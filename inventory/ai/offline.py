@@ -0,0 +1,152 @@
+"""Rule-based reading of simple consumption utterances.
+
+"two milks and an apple" or "snědl jsem tři jogurty" need no model: the text
+is split into parts at "and" / "a" / commas, each part's number word or
+digits give the quantity (1 if there is none, the whole stock for "all" /
+"všechno") and the remaining words are matched against the inventory with
+the candidate index of ``retrieval``, which already folds plurals,
+diminutives and synonyms.
+
+Every part gets a confidence from how well its words match the best item
+and how clearly that item beats the runner-up; the utterance's confidence
+is that of its weakest part, and 0 if any word could not be placed. It is
+lowered when several numbers compete in one part ("one 2 three eggs") or
+more is consumed than is in stock ("10000 eggs"). Callers use the result
+only above ``AI_OFFLINE_MIN_CONFIDENCE`` and ask the model otherwise.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from . import retrieval
+
+DEFAULT_MIN_CONFIDENCE = 0.75
+# How much the best item must beat the second one to count as unambiguous
+MIN_MARGIN = 0.2
+# Applied to the confidence of a part whose reading is doubtful
+DOUBT_PENALTY = 0.5
+
+ALL = -1
+
+NUMBERS = {
+    "en": {
+        "a": 1, "an": 1, "one": 1, "single": 1, "two": 2, "couple": 2, "pair": 2, "three": 3, "four": 4,
+        "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+        "dozen": 12, "all": ALL, "whole": ALL, "entire": ALL, "every": ALL,
+    },
+    "cs": {
+        "jeden": 1, "jedna": 1, "jedno": 1, "jednu": 1, "jednoho": 1, "jedne": 1,
+        "dva": 2, "dve": 2, "dvou": 2, "par": 2, "tri": 3, "trech": 3, "ctyri": 4, "ctyr": 4,
+        "pet": 5, "sest": 6, "sedm": 7, "osm": 8, "devet": 9, "deset": 10, "jedenact": 11, "dvanact": 12,
+        "tucet": 12, "vsechno": ALL, "vsechny": ALL, "vse": ALL, "cely": ALL, "celou": ALL, "cele": ALL,
+        "celeho": ALL, "celej": ALL,
+    },
+}
+# Number words that only stand in for an article, as in "a dozen eggs"
+ARTICLES = {"en": {"a", "an"}, "cs": set()}
+# Words that make a part impossible to read as a whole number
+UNREADABLE = {"half", "quarter", "some", "few", "bit", "pul", "ctvrt", "trochu", "kousek", "nekolik"}
+SEPARATORS = {
+    "en": re.compile(r"[,;+\n]|\b(?:and|plus|with|then)\b"),
+    "cs": re.compile(r"[,;+\n]|\b(?:a|i|plus|pak|s|se)\b"),
+}
+
+
+@dataclass
+class Part:
+    text: str
+    quantity: Optional[int] = None
+    words: List[str] = field(default_factory=list)
+    # Numbers given for this part besides articles; more than one is ambiguous
+    numbers: int = 0
+
+
+@dataclass
+class OfflineResult:
+    entries: List[dict]
+    confidence: float
+
+    def is_confident(self) -> bool:
+        return bool(self.entries) and self.confidence >= min_confidence()
+
+
+def min_confidence() -> float:
+    return getattr(settings, "AI_OFFLINE_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE)
+
+
+def split(text: str, language: str) -> List[Part]:
+    """Parts of the folded utterance with their quantity and item words."""
+    numbers = NUMBERS[language]
+    articles = ARTICLES[language]
+    vocabulary = retrieval.get_vocabulary(language)
+    parts = []
+    for chunk in SEPARATORS[language].split(retrieval.fold(text)):
+        part = Part(chunk.strip())
+        for word in retrieval.WORD.findall(chunk):
+            if word.isdigit():
+                part.quantity = int(word)
+                part.numbers += 1
+            elif word in articles:
+                if part.quantity is None:
+                    part.quantity = 1
+            elif word in numbers:
+                part.quantity = numbers[word]
+                part.numbers += 1
+            elif vocabulary.stem(word) not in vocabulary.stopwords and len(word) >= retrieval.MIN_WORD_LENGTH:
+                part.words.append(word)
+        if part.words or part.quantity is not None:
+            parts.append(part)
+    return parts
+
+
+def parse(text: str, language: str = "en") -> OfflineResult:
+    """Read ``text`` into ``[{id, consumed}]`` entries with a confidence in [0, 1]."""
+    if language not in NUMBERS:
+        language = "en"
+    if any(word in UNREADABLE for word in retrieval.WORD.findall(retrieval.fold(text))):
+        return OfflineResult([], 0.0)
+
+    index = retrieval.get_index(language)
+    parts = split(text, language)
+    if not parts:
+        return OfflineResult([], 0.0)
+
+    consumed: Dict[int, int] = {}
+    stock: Dict[int, int] = {}
+    confidence = 1.0
+    for part in parts:
+        if not part.words:
+            # A number without anything to count
+            return OfflineResult([], 0.0)
+        terms = index.vocabulary.terms(" ".join(part.words), skip_stopwords=True)
+        ranked = index.rank(" ".join(part.words), 5)
+        if not terms or not ranked:
+            return OfflineResult([], 0.0)
+
+        scored = []
+        for score, row in ranked:
+            item_terms = index.name_terms.get(row["name"], ())
+            coverage = min(1.0, len(terms) / len(item_terms)) if item_terms else 0.0
+            scored.append((score / len(terms) * (0.5 + 0.5 * coverage), row))
+        scored.sort(key=lambda entry: -entry[0])
+        best, row = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if best - runner_up < MIN_MARGIN:
+            best *= 0.5
+        if part.numbers > 1:
+            best *= DOUBT_PENALTY
+        confidence = min(confidence, best)
+
+        quantity = 1 if part.quantity is None else part.quantity
+        if quantity == ALL:
+            quantity = row["current_quantity"]
+        consumed[row["id"]] = consumed.get(row["id"], 0) + quantity
+        stock[row["id"]] = row["current_quantity"]
+
+    if any(quantity > stock[item_id] for item_id, quantity in consumed.items()):
+        confidence *= DOUBT_PENALTY
+
+    entries = [{"id": item_id, "consumed": quantity} for item_id, quantity in consumed.items()]
+    return OfflineResult(entries, round(min(confidence, 1.0), 4))
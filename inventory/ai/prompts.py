@@ -0,0 +1,156 @@
+"""Prompt templates loaded from ``BASE_DIR/prompts``.
+
+Files are named ``<language>_<name>.txt`` (e.g. ``cs_consumtion_analysis.txt``)
+or ``<name>.txt`` for prompts shared by all languages. A template may contain
+``{{slot}}`` placeholders; the text before the first slot is the static
+prefix, which is kept as its own string so providers can send it unchanged
+(as a system prompt) instead of copying it into every request. Plain ``{`` and
+``}`` are left alone because the prompts contain JSON examples.
+
+Every file is read once and kept in memory. The directory is rescanned at
+most every ``RELOAD_INTERVAL`` seconds and a file is read again only when its
+mtime changed, so editing a prompt takes effect without a restart while a
+request normally does no file I/O at all.
+"""
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(settings.BASE_DIR) / "prompts"
+RELOAD_INTERVAL = 2.0
+DEFAULT_LANGUAGE = "en"
+
+CONSUMPTION_ANALYSIS = "consumtion_analysis"
+INVENTORIZE = "inventorize"
+FILL_INVENTORY = "fill_inventory"
+
+SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+FILENAME = re.compile(r"^(?:(?P<language>[a-z]{2})_)?(?P<name>\w+)\.txt$")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    language: Optional[str]
+    prefix: str
+    # (slot, literal text following it) in order of appearance
+    parts: Tuple[Tuple[str, str], ...] = ()
+    mtime: float = 0.0
+
+    @classmethod
+    def parse(cls, name: str, language: Optional[str], text: str, mtime: float = 0.0) -> "PromptTemplate":
+        pieces = SLOT.split(text)
+        return cls(name, language, pieces[0], tuple(zip(pieces[1::2], pieces[2::2])), mtime)
+
+    @property
+    def slots(self) -> Tuple[str, ...]:
+        return tuple(slot for slot, _ in self.parts)
+
+    def render_tail(self, **values: str) -> str:
+        """Everything after the static prefix, with the slots filled in."""
+        return "".join(str(values[slot]) + literal for slot, literal in self.parts)
+
+    def render(self, **values: str) -> str:
+        """The whole prompt as one string, for callers that cannot send the prefix separately."""
+        return self.prefix + self.render_tail(**values)
+
+
+# Used when a prompt file is missing or empty
+FALLBACKS = {
+    CONSUMPTION_ANALYSIS: """Based on the inventory and consumed items, identify which items should be removed from inventory.
+Return a JSON response with the following format:
+{
+    "consumed": [
+        {
+            "id": 1,
+            "name": "item_name",
+            "consumed": 1
+        }
+    ]
+}
+
+# Here is my current inventory:
+{{inventory}}
+
+# Here is the speech of the worker from which you extract the items to be removed from the inventory:
+{{user_input}}
+""",
+}
+FALLBACK_TEMPLATES = {name: PromptTemplate.parse(name, None, text) for name, text in FALLBACKS.items()}
+
+
+class PromptRegistry:
+    def __init__(self, directory: Path, reload_interval: float = RELOAD_INTERVAL) -> None:
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.templates: Dict[Tuple[str, Optional[str]], PromptTemplate] = {}
+        self.files: Dict[Path, float] = {}
+        self.checked_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        """Rescan the directory if the reload interval has passed, re-reading changed files."""
+        now = time.monotonic()
+        if not force and self.checked_at is not None and now - self.checked_at < self.reload_interval:
+            return
+        with self.lock:
+            if not force and self.checked_at is not None and now - self.checked_at < self.reload_interval:
+                return
+            self._scan()
+            self.checked_at = time.monotonic()
+
+    def _scan(self) -> None:
+        seen = set()
+        for path in sorted(self.directory.glob("*.txt")) if self.directory.is_dir() else []:
+            match = FILENAME.match(path.name)
+            if not match:
+                continue
+            key = (match["name"], match["language"])
+            seen.add(key)
+            try:
+                mtime = path.stat().st_mtime
+                if self.files.get(path) == mtime and key in self.templates:
+                    continue
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError) as exc:
+                logger.warning("Could not load prompt %s: %s", path, exc)
+                continue
+            self.files[path] = mtime
+            self.templates[key] = PromptTemplate.parse(key[0], key[1], text, mtime)
+            logger.debug("Loaded prompt %s", path)
+        for key in set(self.templates) - seen:
+            del self.templates[key]
+
+    def get(self, name: str, language: Optional[str] = None) -> PromptTemplate:
+        """The template for ``language``, else the English or language-neutral one, else the built-in fallback."""
+        self.refresh()
+        for key in ((name, language), (name, DEFAULT_LANGUAGE), (name, None)):
+            template = self.templates.get(key)
+            if template is not None and (template.prefix or template.parts):
+                return template
+        if name in FALLBACK_TEMPLATES:
+            return FALLBACK_TEMPLATES[name]
+        raise KeyError(f"No prompt named {name!r} in {self.directory}")
+
+    def names(self) -> Dict[str, Tuple[Optional[str], ...]]:
+        """Every loaded prompt name with the languages it exists in."""
+        self.refresh()
+        found: Dict[str, Tuple[Optional[str], ...]] = {}
+        for name, language in sorted(self.templates, key=lambda key: (key[0], key[1] or "")):
+            found[name] = found.get(name, ()) + (language,)
+        return found
+
+
+registry = PromptRegistry(PROMPTS_DIR)
+
+
+def get_prompt(name: str, language: Optional[str] = None) -> PromptTemplate:
+    return registry.get(name, language)
@@ -0,0 +1,156 @@
+"""Cache of parsed LLM answers for consumption suggestions.
+
+The key covers everything the answer depends on: the normalised utterance,
+the language, the provider and model, the item version stamp and the prompt
+template's mtime. Any change to the inventory therefore retires all entries
+without explicit invalidation, while a repeated or double-tapped request
+against an unchanged inventory is answered without calling the model.
+
+``AI_RESPONSE_CACHE`` selects the backend: ``memory`` (default) keeps a
+per-process LRU of ``AI_RESPONSE_CACHE_SIZE`` entries, ``shared`` uses the
+Django cache configured by ``CACHE_BACKEND`` so all workers share answers,
+and ``off`` disables caching. Entries expire after
+``AI_RESPONSE_CACHE_TIMEOUT`` seconds either way.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = "ai:consumed"
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Fold case, collapse whitespace and drop trailing punctuation."""
+    return WHITESPACE.sub(" ", text.casefold()).strip().rstrip(".!?,;").strip()
+
+
+def make_key(user_input: str, language: str, provider: str, model: str, version: int, prompt_mtime: float) -> str:
+    parts = [normalize(user_input), language, provider, model, str(version), repr(prompt_mtime)]
+    digest = hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: int) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SharedBackend:
+    """The Django cache, shared by every worker; size is bounded by its own settings."""
+
+    def get(self, key: str) -> Optional[Any]:
+        return cache.get(key)
+
+    def set(self, key: str, value: Any, timeout: int) -> None:
+        cache.set(key, value, timeout)
+
+    def clear(self) -> None:
+        # Entries are retired by the version stamp in their key
+        pass
+
+
+class ResponseCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return getattr(settings, "AI_RESPONSE_CACHE", "memory")
+
+    @property
+    def timeout(self) -> int:
+        return getattr(settings, "AI_RESPONSE_CACHE_TIMEOUT", 600)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    if self.mode == "shared":
+                        self._backend = SharedBackend()
+                    else:
+                        self._backend = MemoryBackend(getattr(settings, "AI_RESPONSE_CACHE_SIZE", 256))
+        return self._backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.timeout > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        # Plain increments; an occasional lost count under contention is acceptable
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.enabled:
+            self.backend.set(key, value, self.timeout)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this process; with the shared backend the entries are global."""
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "timeout": self.timeout,
+        }
+        backend = self.backend
+        if isinstance(backend, MemoryBackend):
+            stats.update(size=len(backend), max_size=backend.max_size, evictions=backend.evictions)
+        return stats
+
+
+responses = ResponseCache()
@@ -0,0 +1,238 @@
+"""Pick the inventory items an utterance is most likely about.
+
+Only these candidates are sent to the LLM, so the prompt stays the same size
+however large the inventory grows. Names and the utterance are folded to
+lower-case ASCII, split into words, stemmed with a small suffix table for the
+request language and mapped through the synonym groups in ``synonyms.json``
+("mléka" and "milk" both become ``milk``); Czech diminutives are reduced to
+their base word ("jogurtík" is ``jogurt``). Every utterance word is compared
+with every item word by character trigram similarity; an item scores the sum
+of the best similarity of each utterance word.
+
+Each process keeps one index per language, rebuilt when the item version
+stamp moves. Words already seen by the previous index are not processed
+again, so a rebuild after a quantity change costs one query.
+"""
+import heapq
+import json
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from inventory import versioning
+from inventory.models import Item
+
+SYNONYMS_FILE = Path(__file__).resolve().parent / "synonyms.json"
+DEFAULT_CANDIDATES = 40
+# Word pairs less similar than this do not count
+MIN_SIMILARITY = 0.45
+MIN_WORD_LENGTH = 2
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# (suffix, replacement), longest first; a stem keeps at least MIN_STEM characters
+MIN_STEM = 3
+SUFFIXES = {
+    "en": [("sses", "ss"), ("ies", "y"), ("oes", "o"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"), ("s", "")],
+    "cs": [
+        ("ovi", ""), ("ami", ""), ("ech", ""), ("emi", ""), ("ich", ""), ("ach", ""),
+        ("ove", ""), ("ova", ""), ("ovy", ""), ("ou", ""), ("em", ""), ("um", ""), ("ho", ""), ("mu", ""),
+        ("a", ""), ("e", ""), ("i", ""), ("o", ""), ("u", ""), ("y", ""),
+    ],
+}
+# Words ending like this are not plurals
+KEEP = {"en": ("ss", "us", "is")}
+# Diminutive endings of stems and what they reduce to, applied until nothing
+# changes: "rohlicky" stems to "rohlick", then "rohlik", then "rohl"
+DIMINUTIVES = {
+    "cs": [("icek", "ik"), ("ecek", "ek"), ("ick", "ik"), ("eck", "ek"), ("ik", ""), ("ek", "")],
+}
+
+
+def fold(text: str) -> str:
+    """Lower-case and strip diacritics."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(word: str, language: str) -> str:
+    if word.endswith(KEEP.get(language, ())):
+        return word
+    for suffix, replacement in SUFFIXES.get(language, ()):
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= MIN_STEM:
+            return word[: len(word) - len(suffix)] + replacement
+    return word
+
+
+def undiminish(word: str, language: str) -> str:
+    for suffix, replacement in DIMINUTIVES.get(language, ()):
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= MIN_STEM + 1:
+            return word[: len(word) - len(suffix)] + replacement
+    return word
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Vocabulary:
+    """Stopwords and synonym canonicals of one language, keyed by stem."""
+    language: str
+    stopwords: Set[str]
+    canonical: Dict[str, str]
+
+    @classmethod
+    def load(cls, language: str) -> "Vocabulary":
+        with open(SYNONYMS_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        vocabulary = cls(language, set(), {})
+        vocabulary.stopwords = {vocabulary.stem(fold(word)) for word in data["stopwords"]}
+        for group in data["synonyms"]:
+            canonical = fold(group[0])
+            for word in group:
+                vocabulary.canonical.setdefault(vocabulary.stem(fold(word)), canonical)
+        return vocabulary
+
+    def stem(self, word: str) -> str:
+        return stem(word, self.language)
+
+    def terms(self, text: str, skip_stopwords: bool = False) -> List[str]:
+        found = []
+        for word in WORD.findall(fold(text)):
+            if len(word) < MIN_WORD_LENGTH or word.isdigit():
+                continue
+            stemmed = self.stem(word)
+            if skip_stopwords and stemmed in self.stopwords:
+                continue
+            found.append(self.normalize(stemmed))
+        return found
+
+    def normalize(self, stemmed: str) -> str:
+        """The synonym canonical of a stem, else of its shortest diminutive base."""
+        while stemmed not in self.canonical:
+            base = undiminish(stemmed, self.language)
+            if base == stemmed:
+                return stemmed
+            stemmed = base
+        return self.canonical[stemmed]
+
+
+@dataclass
+class CandidateIndex:
+    version: int
+    vocabulary: Vocabulary
+    rows: List[dict] = field(default_factory=list)
+    # Distinct item terms, the items using each and the trigram postings
+    terms: List[str] = field(default_factory=list)
+    term_items: List[List[int]] = field(default_factory=list)
+    term_sizes: List[int] = field(default_factory=list)
+    postings: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    name_terms: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, version: int, vocabulary: Vocabulary, rows, previous: Optional["CandidateIndex"] = None):
+        index = cls(version, vocabulary)
+        known = previous.name_terms if previous is not None else {}
+        term_ids: Dict[str, int] = {}
+        for row in rows:
+            position = len(index.rows)
+            index.rows.append(row)
+            name = row["name"]
+            terms = known.get(name)
+            if terms is None:
+                terms = tuple(dict.fromkeys(vocabulary.terms(name)))
+            index.name_terms[name] = terms
+            for term in terms:
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(index.terms)
+                    index.terms.append(term)
+                    index.term_items.append([])
+                    grams = trigrams(term)
+                    index.term_sizes.append(len(grams))
+                    for gram in grams:
+                        index.postings[gram].append(term_id)
+                index.term_items[term_id].append(position)
+        return index
+
+    def similar_terms(self, term: str) -> Dict[int, float]:
+        """Item terms at least MIN_SIMILARITY alike to ``term``, by Dice coefficient."""
+        grams = trigrams(term)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for term_id in self.postings.get(gram, ()):
+                shared[term_id] += 1
+        similar = {}
+        for term_id, count in shared.items():
+            score = 2.0 * count / (len(grams) + self.term_sizes[term_id])
+            if score >= MIN_SIMILARITY:
+                similar[term_id] = score
+        return similar
+
+    def rank(self, text: str, limit: int) -> List[Tuple[float, dict]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in dict.fromkeys(self.vocabulary.terms(text, skip_stopwords=True)):
+            best: Dict[int, float] = {}
+            for term_id, score in self.similar_terms(term).items():
+                for position in self.term_items[term_id]:
+                    if score > best.get(position, 0.0):
+                        best[position] = score
+            for position, score in best.items():
+                scores[position] += score
+        top = heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], -entry[0]))
+        return [(score, self.rows[position]) for position, score in top]
+
+
+_vocabularies: Dict[str, Vocabulary] = {}
+_indexes: Dict[str, CandidateIndex] = {}
+_lock = threading.Lock()
+
+
+def get_vocabulary(language: str) -> Vocabulary:
+    vocabulary = _vocabularies.get(language)
+    if vocabulary is None:
+        vocabulary = _vocabularies[language] = Vocabulary.load(language)
+    return vocabulary
+
+
+def get_index(language: str) -> CandidateIndex:
+    """Return the index for ``language``, rebuilding it if the item stamp moved."""
+    version = versioning.get(versioning.ITEMS)
+    index = _indexes.get(language)
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        index = _indexes.get(language)
+        if index is None or index.version != version:
+            rows = Item.objects.order_by("name").values("id", "name", "current_quantity")
+            index = CandidateIndex.build(version, get_vocabulary(language), rows, previous=index)
+            _indexes[language] = index
+    return index
+
+
+def max_candidates() -> int:
+    return getattr(settings, "AI_MAX_CANDIDATES", DEFAULT_CANDIDATES)
+
+
+def candidates(text: str, language: str = "en", limit: Optional[int] = None) -> List[dict]:
+    """The ``{id, name, current_quantity}`` rows to put into the prompt, best match first.
+
+    Small inventories are sent whole. If nothing resembles the utterance the
+    first ``limit`` items are sent so the model can still match by meaning.
+    """
+    limit = limit or max_candidates()
+    index = get_index(language if language in SUFFIXES else "en")
+    if len(index.rows) <= limit:
+        return list(index.rows)
+    ranked = index.rank(text, limit)
+    if not ranked:
+        return index.rows[:limit]
+    return [row for _, row in ranked]
@@ -0,0 +1,102 @@
+"""Incremental parsing of streamed model output.
+
+``ConsumedParser`` is fed the model's text as it arrives and returns every
+entry of the top-level ``consumed`` array as soon as its closing brace has
+been seen, so the first suggestion can be shown while the model is still
+writing the rest. Like ``structured.parse_consumed`` it also accepts a bare
+top-level array of entries. Text around the JSON (prose, Markdown fences) is
+ignored. Each character is looked at once.
+"""
+import json
+from typing import List, Optional
+
+
+class ConsumedParser:
+    def __init__(self, key: str = "consumed") -> None:
+        self.key = key
+        self.text_seen = 0
+        # Containers currently open, "{" or "["
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.string: List[str] = []
+        # Last string read at the top level of the root object, i.e. a key
+        self.last_key: Optional[str] = None
+        self.array_depth: Optional[int] = None
+        self.entry: Optional[List[str]] = None
+        self.errors = 0
+        self.finished = False
+        # Whether the entries array was found at all
+        self.found = False
+
+    @property
+    def started(self) -> bool:
+        return bool(self.stack) or self.finished
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume ``chunk`` and return the entries completed by it."""
+        completed = []
+        self.text_seen += len(chunk)
+        for char in chunk:
+            if self.finished:
+                break
+            if self.entry is not None:
+                self.entry.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1 and self.entry is None:
+                        self.last_key = "".join(self.string)
+                else:
+                    if len(self.stack) == 1:
+                        self.string.append(char)
+                continue
+
+            if char == '"':
+                if self.stack:
+                    self.in_string = True
+                    self.string = []
+            elif char == "{":
+                if not self.stack:
+                    # Root object; anything before it is ignored
+                    self.stack.append(char)
+                    continue
+                self.stack.append(char)
+                if self.array_depth is not None and len(self.stack) == self.array_depth + 1:
+                    self.entry = [char]
+            elif char == "[":
+                self.stack.append(char)
+                if len(self.stack) == 1 or (
+                    len(self.stack) == 2 and self.stack[0] == "{" and self.last_key == self.key
+                ):
+                    # A root array is the list of entries itself
+                    self.array_depth = len(self.stack)
+                    self.found = True
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                if char == "}" and self.entry is not None and len(self.stack) == self.array_depth:
+                    entry = self._load("".join(self.entry))
+                    self.entry = None
+                    if entry is not None:
+                        completed.append(entry)
+                elif char == "]" and self.array_depth is not None and len(self.stack) == self.array_depth - 1:
+                    self.array_depth = None
+                if not self.stack:
+                    self.finished = True
+        return completed
+
+    def _load(self, text: str) -> Optional[dict]:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            self.errors += 1
+            return None
+        if not isinstance(value, dict):
+            self.errors += 1
+            return None
+        return value
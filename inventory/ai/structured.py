@@ -0,0 +1,130 @@
+"""Structured output for consumption suggestions.
+
+``CONSUMED_SCHEMA`` is sent to the model (Ollama's ``format``, Gemini's
+``response_schema``) so that it can only produce
+``{"consumed": [{"id": <int>, "consumed": <int>}, ...]}``. What comes back is
+still checked here instead of trusted: ``parse_consumed`` decodes the first
+JSON object in the text, closes it locally if the output was cut off (a
+token limit, a dropped connection) and keeps only well-formed entries, so a
+near-miss costs no second model call.
+"""
+import json
+import re
+from typing import Any, List, Optional
+
+from django.conf import settings
+
+CONSUMED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "consumed": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "consumed": {"type": "integer"},
+                },
+                "required": ["id", "consumed"],
+            },
+        },
+    },
+    "required": ["consumed"],
+}
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_decoder = json.JSONDecoder()
+
+
+class InvalidResponse(ValueError):
+    """The model's answer has no usable ``consumed`` list."""
+
+
+def enabled() -> bool:
+    return getattr(settings, "AI_STRUCTURED_OUTPUT", True)
+
+
+def _integer(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdecimal():
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def clean_entry(entry: Any) -> Optional[dict]:
+    """``{"id", "consumed"}`` with integer values, or None if the entry is unusable."""
+    if not isinstance(entry, dict):
+        return None
+    item_id = _integer(entry.get("id"))
+    consumed = _integer(entry.get("consumed"))
+    if item_id is None or consumed is None or consumed < 0:
+        return None
+    return {"id": item_id, "consumed": consumed}
+
+
+def validate(data: Any) -> List[dict]:
+    """The clean entries of a decoded answer; a bare list is accepted as the entries."""
+    entries = data.get("consumed") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise InvalidResponse("no consumed list")
+    return [entry for entry in map(clean_entry, entries) if entry is not None]
+
+
+def repair(text: str) -> str:
+    """Close a JSON document that was cut off, dropping its unfinished last value."""
+    stack = []
+    in_string = False
+    escaped = False
+    # Length and open containers after the last complete value inside a container
+    cut = None
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            if len(stack) == 1:
+                cut = (position + 1, list(stack))
+        elif char in "}]" and stack:
+            stack.pop()
+            if not stack:
+                return text[:position + 1]
+            cut = (position + 1, list(stack))
+    if cut is None:
+        return text
+    length, open_containers = cut
+    return text[:length].rstrip().rstrip(",") + "".join(reversed(open_containers))
+
+
+def _decode(text: str) -> Any:
+    starts = [position for position in (text.find("{"), text.find("[")) if position >= 0]
+    if not starts:
+        raise InvalidResponse("no JSON in the answer")
+    text = text[min(starts):]
+    for candidate in (text, repair(text)):
+        for attempt in (candidate, TRAILING_COMMA.sub(r"\1", candidate)):
+            try:
+                return _decoder.raw_decode(attempt)[0]
+            except ValueError:
+                continue
+    raise InvalidResponse("the answer is not valid JSON")
+
+
+def parse_consumed(raw_response: str) -> List[dict]:
+    """Decode, repair if needed and validate a complete answer. Raises ``InvalidResponse``."""
+    return validate(_decode(raw_response or ""))
@@ -6,6 +6,9 @@ class InventoryConfig(AppConfig):
     name = 'inventory'
 
     def ready(self) -> None:
+        # Connect signal handlers that keep the search index in sync
+        from . import signals  # noqa: F401
+
         # Import and initialize plugins when app is ready
         try:
             from .plugin_loader import initialize_plugins
@@ -0,0 +1,96 @@
+"""In-memory prefix index for tag and location autocomplete.
+
+Tags and locations are small and change rarely, so each process keeps a sorted
+array of their names and answers keystrokes with a binary search instead of an
+``icontains`` query. Each index remembers the ``ChangeStamp`` version it was
+built from and is rebuilt lazily once a save or delete elsewhere bumps it.
+"""
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from . import versioning
+from .models import Location, Tag
+
+MAX_RESULTS = 10
+WORD_START = re.compile(r"\b\w")
+
+
+@dataclass
+class PrefixIndex:
+    """Sorted keys for every word start of every name, plus the prebuilt results."""
+    version: int
+    results: List[dict]
+    names: List[str] = field(default_factory=list)
+    keys: List[Tuple[str, int]] = field(default_factory=list)
+
+    @classmethod
+    def build(cls, version: int, rows) -> "PrefixIndex":
+        results = []
+        names = []
+        keys = []
+        for pk, name, emoji, color in rows:
+            position = len(results)
+            results.append({'id': pk, 'name': name, 'emoji': emoji, 'color': color, 'type': 'existing'})
+            lowered = name.casefold()
+            names.append(lowered)
+            # Index the whole name and the start of every following word
+            keys.append((lowered, position))
+            for word in WORD_START.finditer(lowered):
+                if word.start():
+                    keys.append((lowered[word.start():], position))
+        keys.sort()
+        return cls(version=version, results=results, names=names, keys=keys)
+
+    def lookup(self, query: str, limit: int = MAX_RESULTS) -> List[dict]:
+        """Whole-name prefix matches first, then word prefixes, then substrings; by name within each."""
+        query = query.casefold()
+        if not query:
+            return []
+
+        ranked: Dict[int, int] = {}
+        i = bisect_left(self.keys, (query,))
+        while i < len(self.keys) and self.keys[i][0].startswith(query):
+            key, position = self.keys[i]
+            rank = 0 if key == self.names[position] else 1
+            ranked[position] = min(rank, ranked.get(position, rank))
+            i += 1
+
+        if len(ranked) < limit:
+            # Substring fallback for matches that do not start at a word boundary
+            for position, name in enumerate(self.names):
+                if position not in ranked and query in name:
+                    ranked[position] = 2
+
+        order = sorted(ranked, key=lambda position: (ranked[position], self.names[position]))
+        return [self.results[position] for position in order[:limit]]
+
+
+_SOURCES = {
+    "tag": (Tag, versioning.TAGS),
+    "location": (Location, versioning.LOCATIONS),
+}
+_indexes: Dict[str, PrefixIndex] = {}
+_lock = threading.Lock()
+
+
+def get_index(kind: str) -> PrefixIndex:
+    """Return the index for ``kind``, rebuilding it if its version stamp moved."""
+    model, scope = _SOURCES[kind]
+    version = versioning.get(scope)
+    index = _indexes.get(kind)
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        index = _indexes.get(kind)
+        if index is None or index.version != version:
+            rows = model.objects.order_by("name").values_list("id", "name", "emoji", "color")
+            index = PrefixIndex.build(version, rows)
+            _indexes[kind] = index
+    return index
+
+
+def suggest(kind: str, query: str, limit: int = MAX_RESULTS) -> List[dict]:
+    return get_index(kind).lookup(query.strip(), limit)
@@ -0,0 +1,127 @@
+"""Version-keyed caching of rendered pages and table rows, and HTTP validators.
+
+Pages are cached under the inventory-wide ``ChangeStamp`` version, so any write
+to items, tags, locations or settings retires every cached page at once without
+explicit invalidation. Item rows are cached individually under a key built from
+everything they display, so after a single edit only that row is re-rendered.
+"""
+import hashlib
+import re
+from functools import wraps
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import versioning
+
+CSRF_PLACEHOLDER = "__csrf_token__"
+CSRF_META = re.compile(rb'<meta name="csrf-token" content="([^"]+)"')
+
+
+def page_cache_timeout() -> int:
+    return getattr(settings, "PAGE_CACHE_TIMEOUT", 3600)
+
+
+def page_cache_key(request: HttpRequest, name: str, version: int) -> str:
+    path = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+    return f"page:{name}:{translation.get_language()}:{version}:{path}"
+
+
+def _strip_csrf(content: bytes) -> bytes:
+    # Every {% csrf_token %} in one render carries the same masked token
+    match = CSRF_META.search(content)
+    if match is None:
+        return content
+    return content.replace(match.group(1), CSRF_PLACEHOLDER.encode("ascii"))
+
+
+def _restore_csrf(content: bytes, request: HttpRequest) -> bytes:
+    # get_token() also makes CsrfViewMiddleware set the cookie for new clients
+    return content.replace(CSRF_PLACEHOLDER.encode("ascii"), get_token(request).encode("ascii"))
+
+
+def versioned_page(view: Callable) -> Callable:
+    """Cache a view's rendered HTML per language and URL under the inventory version."""
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        timeout = page_cache_timeout()
+        if request.method not in ("GET", "HEAD") or not timeout:
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request, view.__name__, _stamp(request, versioning.INVENTORY)[0])
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(_restore_csrf(content, request), content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (_strip_csrf(response.content), response["Content-Type"]), timeout)
+        return response
+
+    return wrapper
+
+
+def _stamp(request: HttpRequest, scope: str) -> tuple:
+    # The ETag and Last-Modified callbacks share one lookup per request
+    stamps = request.__dict__.setdefault("_change_stamps", {})
+    if scope not in stamps:
+        stamps[scope] = versioning.get_stamp(scope)
+    return stamps[scope]
+
+
+def conditional_on(scope: str) -> Callable:
+    """Answer conditional GETs with 304 while ``scope`` has not changed.
+
+    The ETag combines the scope version with the language and the full URL, so
+    it is derived without touching the view. Responses ask clients to
+    revalidate every time, which costs them one stamp lookup when nothing
+    changed.
+    """
+    def etag(request: HttpRequest, *args, **kwargs) -> str:
+        version, _ = _stamp(request, scope)
+        path = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()[:12]
+        return f"{scope}-{version}-{translation.get_language()}-{path}"
+
+    def last_modified(request: HttpRequest, *args, **kwargs):
+        return _stamp(request, scope)[1]
+
+    def decorator(view: Callable) -> Callable:
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def set_row_keys(items: Iterable) -> None:
+    """Attach ``row_key`` to prefetched items for the per-row fragment cache.
+
+    The key covers every value the row displays. Tag and location colours,
+    emojis and names are covered by their scope versions.
+    """
+    stamps = versioning.get_many([versioning.TAGS, versioning.LOCATIONS])
+    for item in items:
+        parts = [
+            item.id,
+            item.name,
+            item.desired_quantity,
+            item.current_quantity,
+            ",".join(str(tag.id) for tag in item.tags.all()),
+            ",".join(str(location.id) for location in item.locations.all()),
+            stamps[versioning.TAGS],
+            stamps[versioning.LOCATIONS],
+        ]
+        item.row_key = hashlib.md5("|".join(map(str, parts)).encode("utf-8")).hexdigest()
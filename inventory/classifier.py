@@ -0,0 +1,271 @@
+"""Colour and emoji assignment for tag and location names.
+
+The keyword rules live in JSON files: ``inventory/classifier_rules/<kind>.json``
+first, then language files such as ``<kind>.cs.json``, then any
+``classifier_rules/<kind>*.json`` shipped by a plugin. Language files only
+apply in their language (the active one, else ``LANGUAGE_CODE``), so Czech
+word stems do not restyle English names. Each file is a list of
+``{"pattern": ..., "color": ..., "emoji": ...}`` objects and the first rule
+whose pattern occurs in the lower-cased name wins.
+
+The literal keywords of all rules of a kind are compiled once into an
+Aho-Corasick automaton, so a single pass over the name finds every rule that
+can match, however many files contribute. Only those candidates, lowest index
+first, are confirmed with their own precompiled pattern. Rules without a
+literal keyword (e.g. a pattern starting with a character class) are always
+checked. Results for recent names are memoized.
+"""
+import json
+import logging
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+RULES_DIR = Path(__file__).resolve().parent / "classifier_rules"
+CACHE_SIZE = 1024
+DEFAULT_COLOR = "#6b7280"
+DEFAULTS = {
+    "tag": (DEFAULT_COLOR, "🏷️"),
+    "location": (DEFAULT_COLOR, "📍"),
+}
+
+
+# Leading literal text of a regex alternative, after an optional word boundary
+LITERAL_PREFIX = re.compile(r"(?:\\b)?([^\\\[\](){}.*+?|^$]*)")
+
+
+@dataclass(frozen=True)
+class Rule:
+    pattern: str
+    color: str
+    emoji: str
+    regex: re.Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "regex", re.compile(self.pattern))
+
+
+def _alternatives(pattern: str) -> List[str]:
+    """Split a pattern on its top-level ``|``, unwrapping one enclosing group."""
+    if pattern.startswith("(") and pattern.endswith(")") and _closing_paren(pattern) == len(pattern) - 1:
+        pattern = pattern[1:-1]
+        if pattern.startswith("?:"):
+            pattern = pattern[2:]
+    parts = []
+    current = []
+    depth = 0
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _closing_paren(pattern: str) -> int:
+    depth = 0
+    escaped = False
+    for position, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return position
+    return -1
+
+
+def keywords(pattern: str) -> Optional[List[str]]:
+    """Literal text that every match of ``pattern`` must contain, per alternative.
+
+    Returns None if some alternative has no mandatory literal prefix.
+    """
+    found = []
+    for alternative in _alternatives(pattern):
+        match = LITERAL_PREFIX.match(alternative)
+        literal = match.group(1)
+        if alternative[match.end():match.end() + 1] in ("?", "*", "{"):
+            # The last character is optional
+            literal = literal[:-1]
+        if not literal:
+            return None
+        found.append(literal)
+    return found
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting the values of all keywords found in a text."""
+
+    def __init__(self) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Set[int]] = [set()]
+
+    def add(self, keyword: str, value: int) -> None:
+        state = 0
+        for char in keyword:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(set())
+                self.goto[state][char] = following
+            state = following
+        self.output[state].add(value)
+
+    def build(self) -> None:
+        """Compute the failure links; call once after the last ``add``."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                self.output[following] |= self.output[self.fail[following]]
+
+    def find(self, text: str) -> Set[int]:
+        goto, fail, output = self.goto, self.fail, self.output
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class Classifier:
+    """First-match-wins keyword rules behind one keyword automaton."""
+
+    def __init__(self, rules: Iterable[Rule], default: Tuple[str, str]) -> None:
+        self.rules = list(rules)
+        self.default = default
+        self.automaton = KeywordAutomaton()
+        self.unanchored: Set[int] = set()
+        for index, rule in enumerate(self.rules):
+            literals = keywords(rule.pattern)
+            if literals is None:
+                self.unanchored.add(index)
+                continue
+            for literal in literals:
+                self.automaton.add(literal, index)
+        self.automaton.build()
+        self.classify = lru_cache(maxsize=CACHE_SIZE)(self._classify)
+
+    def _classify(self, name: str) -> Tuple[str, str]:
+        name = name.lower().strip()
+        for index in sorted(self.automaton.find(name) | self.unanchored):
+            rule = self.rules[index]
+            if rule.regex.search(name):
+                return rule.color, rule.emoji
+        return self.default
+
+
+def load_rules(path: Path) -> List[Rule]:
+    """Read one rule file, skipping entries whose pattern does not compile."""
+    rules = []
+    with open(path, encoding="utf-8") as f:
+        for entry in json.load(f):
+            try:
+                rules.append(Rule(entry["pattern"], entry["color"], entry["emoji"]))
+            except re.error as exc:
+                logger.warning("Ignoring classifier rule %r in %s: %s", entry["pattern"], path, exc)
+    return rules
+
+
+def current_language() -> str:
+    """The base language rules are chosen for, e.g. "cs" for "cs-cz"."""
+    return (translation.get_language() or settings.LANGUAGE_CODE).split("-")[0].lower()
+
+
+def _file_language(path: Path) -> Optional[str]:
+    """The language of ``tag.cs.json``, or None for a file that applies in every language."""
+    parts = path.name.split(".")
+    return parts[1] if len(parts) == 3 else None
+
+
+def rule_files(kind: str, language: str) -> List[Path]:
+    files = [RULES_DIR / f"{kind}.json"]
+    files += sorted(RULES_DIR.glob(f"{kind}.*.json"))
+    plugins_dir = Path(settings.BASE_DIR) / "plugins"
+    if plugins_dir.exists():
+        files += sorted(plugins_dir.rglob(f"classifier_rules/{kind}*.json"))
+    return [path for path in files if path.is_file() and _file_language(path) in (None, language)]
+
+
+# Keyed by (kind, language)
+_classifiers: Dict[Tuple[str, str], Classifier] = {}
+_extra_rules: Dict[str, List[Rule]] = {}
+_lock = threading.Lock()
+
+
+def get_classifier(kind: str, language: Optional[str] = None) -> Classifier:
+    key = (kind, language or current_language())
+    classifier = _classifiers.get(key)
+    if classifier is None:
+        with _lock:
+            classifier = _classifiers.get(key)
+            if classifier is None:
+                rules = []
+                for path in rule_files(*key):
+                    try:
+                        rules += load_rules(path)
+                    except (OSError, ValueError, KeyError, TypeError) as exc:
+                        logger.warning("Could not load classifier rules from %s: %s", path, exc)
+                rules += _extra_rules.get(kind, [])
+                classifier = Classifier(rules, DEFAULTS[kind])
+                _classifiers[key] = classifier
+    return classifier
+
+
+def register_rules(kind: str, rules: Iterable[Tuple[str, str, str]]) -> None:
+    """Append ``(pattern, color, emoji)`` rules at runtime, e.g. from a plugin's ``on_ready``."""
+    with _lock:
+        _extra_rules.setdefault(kind, []).extend(Rule(*rule) for rule in rules)
+        for key in [key for key in _classifiers if key[0] == kind]:
+            del _classifiers[key]
+
+
+def reset() -> None:
+    """Drop the compiled classifiers so rule files are read again."""
+    with _lock:
+        _classifiers.clear()
+
+
+def classify(kind: str, name: str, language: Optional[str] = None) -> Tuple[str, str]:
+    """Return ``(color, emoji)`` for a ``"tag"`` or ``"location"`` name.
+
+    ``language`` defaults to ``current_language()``.
+    """
+    return get_classifier(kind, language).classify(name)
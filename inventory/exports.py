@@ -0,0 +1,118 @@
+"""Streaming shopping-list export in text, CSV and JSON Lines.
+
+Rows are read with ``QuerySet.iterator()`` in chunks and encoded one by one,
+so memory stays flat and the first bytes go out before the query is done.
+Grouping by location or tag is a single ordered LEFT JOIN: an item stored in
+two locations appears in both groups, items without any land in a last group
+with an empty name.
+
+The streamers are sync generators. Under ASGI Django would read a sync
+iterator to the end before sending anything, so views hand them to
+``aiter_lines`` there, which reads a chunk at a time on the sync thread.
+"""
+import csv
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from django.utils.translation import gettext as _
+
+from .models import Item
+
+CHUNK_SIZE = 500
+
+FORMATS = {
+    "txt": ("text/plain; charset=utf-8", "txt"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+# Group key -> (lookup on Item, column name in the export)
+GROUPS = {
+    "location": ("locations__name", "location"),
+    "tag": ("tags__name", "tag"),
+}
+
+
+def shopping_list_rows(group: Optional[str] = None) -> Iterator[Tuple[Optional[str], str, int]]:
+    """Yield ``(group name, item name, missing)`` ordered by group, then item name."""
+    items = Item.objects.filter(missing_quantity__gt=0)
+    if group is None:
+        rows = items.order_by("name").values_list("name", "missing_quantity")
+        for name, missing in rows.iterator(chunk_size=CHUNK_SIZE):
+            yield None, name, missing
+        return
+
+    lookup = GROUPS[group][0]
+    rows = items.order_by(F(lookup).asc(nulls_last=True), "name").values_list(lookup, "name", "missing_quantity")
+    yield from rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object whose write() hands the encoded line back to the caller."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_text(group: Optional[str] = None) -> Iterator[str]:
+    # Translate now: the generator body runs while the response is streamed
+    no_group = _("No location") if group == "location" else _("No tag")
+    all_stocked = _("All stocked!")
+
+    def lines() -> Iterator[str]:
+        empty = True
+        current = object()
+        for group_name, name, missing in shopping_list_rows(group):
+            if group and group_name != current:
+                separator = "" if empty else "\n"
+                yield f"{separator}## {group_name or no_group}\n"
+                current = group_name
+            empty = False
+            yield f"{name}: {missing}\n"
+        if empty:
+            yield all_stocked + "\n"
+
+    return lines()
+
+
+def stream_csv(group: Optional[str] = None) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    header = ["name", "missing"]
+    if group:
+        header.append(GROUPS[group][1])
+    yield writer.writerow(header)
+    for group_name, name, missing in shopping_list_rows(group):
+        row = [name, missing]
+        if group:
+            row.append(group_name or "")
+        yield writer.writerow(row)
+
+
+def stream_jsonl(group: Optional[str] = None) -> Iterator[str]:
+    for group_name, name, missing in shopping_list_rows(group):
+        record = {"name": name, "missing": missing}
+        if group:
+            record[GROUPS[group][1]] = group_name
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+async def aiter_lines(lines: Iterator[str], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[str]:
+    """Yield ``lines`` to an async consumer, ``chunk_size`` lines joined per trip to the sync thread."""
+    read = sync_to_async(lambda: "".join(islice(lines, chunk_size)))
+    try:
+        while chunk := await read():
+            yield chunk
+    finally:
+        if hasattr(lines, "close"):
+            # Releases the database cursor if the client went away early
+            await sync_to_async(lines.close)()
+
+
+STREAMERS = {
+    "txt": stream_text,
+    "csv": stream_csv,
+    "jsonl": stream_jsonl,
+}
@@ -0,0 +1,288 @@
+"""Bulk import of items from CSV or JSON Lines.
+
+Input is parsed row by row, then written in one transaction with a handful of
+set-based statements: one lookup per name chunk for existing tags, locations
+and items, ``bulk_create`` for whatever is missing, and batched inserts of the
+many-to-many through-rows. Bulk writes skip the model signals, so the change
+stamps and the search index are refreshed once at the end instead.
+
+Recognised columns are ``name``, ``desired_quantity``, ``current_quantity``,
+``locations`` and ``tags``. In CSV the label columns hold comma-separated names;
+in JSON Lines they may also be lists.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Dict, IO, Iterable, Iterator, List, Sequence, Tuple
+
+from django.db import transaction
+
+from . import search, versioning
+from .models import Item, Location, Tag, UserSettings, name_key
+
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+# Keeps every ``IN (...)`` below SQLite's bound-parameter limit
+LOOKUP_CHUNK = 900
+MAX_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    """The input cannot be read in the requested format."""
+
+
+@dataclass
+class ImportRow:
+    line: int
+    name: str
+    desired_quantity: int
+    current_quantity: int
+    locations: List[str]
+    tags: List[str]
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    tags_created: int = 0
+    locations_created: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"line {line}: {message}")
+
+    def as_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "tags_created": self.tags_created,
+            "locations_created": self.locations_created,
+            "errors": self.errors,
+        }
+
+
+def detect_format(filename: str, default: str = "csv") -> str:
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return default
+
+
+def text_stream(binary: IO[bytes]) -> io.TextIOWrapper:
+    """Decode an uploaded or opened binary file lazily, ignoring a UTF-8 BOM."""
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def read_csv(stream: IO[str]) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or "name" not in [f.strip() for f in reader.fieldnames]:
+        raise ImportFormatError("CSV input needs a header row with a 'name' column")
+    for record in reader:
+        yield reader.line_num, {(key or "").strip(): value for key, value in record.items()}
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[Tuple[int, dict]]:
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ImportFormatError(f"line {line_number}: invalid JSON ({exc.msg})") from exc
+        if not isinstance(record, dict):
+            raise ImportFormatError(f"line {line_number}: expected a JSON object")
+        yield line_number, record
+
+
+READERS = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+}
+
+
+def _key(name: str) -> str:
+    # Names are unique ignoring case, see NamedQuerySet
+    return name_key(name)
+
+
+def _names(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    names = {}
+    for name in value:
+        name = str(name).strip()
+        if name:
+            names.setdefault(_key(name), name)
+    return list(names.values())
+
+
+def _quantity(value) -> int:
+    if value is None or value == "":
+        return 0
+    quantity = int(value)
+    if quantity < 0:
+        raise ValueError("quantities cannot be negative")
+    return quantity
+
+
+def parse_rows(records: Iterable[Tuple[int, dict]], result: ImportResult) -> Iterator[ImportRow]:
+    """Validate raw records, recording rejected ones in ``result``."""
+    for line, record in records:
+        name = str(record.get("name") or "").strip()
+        if not name:
+            result.skipped += 1
+            result.add_error(line, "missing name")
+            continue
+        if len(name) > Item._meta.get_field("name").max_length:
+            result.skipped += 1
+            result.add_error(line, "name is too long")
+            continue
+        try:
+            desired = _quantity(record.get("desired_quantity"))
+            current = _quantity(record.get("current_quantity"))
+        except (TypeError, ValueError):
+            result.skipped += 1
+            result.add_error(line, "quantities must be non-negative integers")
+            continue
+        yield ImportRow(
+            line=line,
+            name=name,
+            desired_quantity=desired,
+            current_quantity=current,
+            locations=_names(record.get("locations")),
+            tags=_names(record.get("tags")),
+        )
+
+
+def _chunks(values: Sequence, size: int = LOOKUP_CHUNK) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _ids_by_name(model, names: Sequence[str]) -> Dict[str, int]:
+    """Return ``{_key(name): id}`` of the existing rows matching ``names`` in any case."""
+    ids = {}
+    for chunk in _chunks(names):
+        ids.update(model.objects.named_any(chunk).values_list("name_key", "id"))
+    return ids
+
+
+def _resolve_labels(model, names: Sequence[str], user_settings: UserSettings, batch_size: int) -> Tuple[Dict[str, int], int]:
+    """Return ``{_key(name): id}`` for ``names``, creating the missing labels in bulk."""
+    max_length = model._meta.get_field("name").max_length
+    names = [name for name in names if len(name) <= max_length]
+    ids = _ids_by_name(model, names)
+    # bulk_create skips save(), which sets name_key
+    missing = [model(name=name, name_key=_key(name)) for name in names if _key(name) not in ids]
+    for label in missing:
+        label.apply_default_style(user_settings)
+    model.objects.bulk_create(missing, batch_size=batch_size)
+    if missing:
+        # Not every backend returns primary keys from bulk_create
+        ids.update(_ids_by_name(model, [label.name for label in missing]))
+    return ids, len(missing)
+
+
+def _link(through, item_field: str, label_field: str, pairs: List[Tuple[int, int]], batch_size: int) -> None:
+    rows = [through(**{item_field: item_id, label_field: label_id}) for item_id, label_id in pairs]
+    through.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+
+
+def import_items(
+    records: Iterable[Tuple[int, dict]],
+    update_existing: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> ImportResult:
+    """Import ``(line number, record)`` pairs in a single transaction.
+
+    Items whose name already exists are skipped, or with ``update_existing``
+    get their quantities overwritten and the listed tags and locations added.
+    Names are compared ignoring case. A name repeated within the input keeps
+    its last row.
+    """
+    result = ImportResult()
+    rows: Dict[str, ImportRow] = {}
+    for row in parse_rows(records, result):
+        if _key(row.name) in rows:
+            result.skipped += 1
+        rows[_key(row.name)] = row
+    if not rows:
+        return result
+
+    location_names = _names(name for row in rows.values() for name in row.locations)
+    tag_names = _names(name for row in rows.values() for name in row.tags)
+    user_settings = UserSettings.get_settings()
+
+    with transaction.atomic():
+        location_ids, result.locations_created = _resolve_labels(Location, location_names, user_settings, batch_size)
+        tag_ids, result.tags_created = _resolve_labels(Tag, tag_names, user_settings, batch_size)
+
+        existing = _ids_by_name(Item, [row.name for row in rows.values()])
+        new_rows = [row for key, row in rows.items() if key not in existing]
+        Item.objects.bulk_create(
+            [
+                Item(
+                    name=row.name, name_key=_key(row.name),
+                    desired_quantity=row.desired_quantity, current_quantity=row.current_quantity,
+                )
+                for row in new_rows
+            ],
+            batch_size=batch_size,
+        )
+        result.created = len(new_rows)
+
+        if update_existing and existing:
+            updates = []
+            for key, item_id in existing.items():
+                row = rows[key]
+                updates.append(Item(id=item_id, desired_quantity=row.desired_quantity, current_quantity=row.current_quantity))
+            Item.objects.bulk_update(updates, ["desired_quantity", "current_quantity"], batch_size=batch_size)
+            result.updated = len(updates)
+            linked_rows = list(rows.values())
+        else:
+            result.skipped += len(existing)
+            linked_rows = new_rows
+
+        item_ids = _ids_by_name(Item, [row.name for row in linked_rows]) if new_rows else existing
+        location_pairs = [
+            (item_ids[_key(row.name)], location_ids[_key(name)])
+            for row in linked_rows for name in row.locations if _key(name) in location_ids
+        ]
+        tag_pairs = [
+            (item_ids[_key(row.name)], tag_ids[_key(name)])
+            for row in linked_rows for name in row.tags if _key(name) in tag_ids
+        ]
+        _link(Item.locations.through, "item_id", "location_id", location_pairs, batch_size)
+        _link(Item.tags.through, "item_id", "tag_id", tag_pairs, batch_size)
+
+        if result.created or result.updated or result.tags_created or result.locations_created:
+            versioning.bump(versioning.ITEMS, versioning.TAGS, versioning.LOCATIONS)
+            if search.is_available():
+                search.rebuild()
+
+    return result
+
+
+def import_file(
+    stream: IO[str],
+    file_format: str,
+    update_existing: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> ImportResult:
+    """Parse and import a text stream in ``file_format`` ("csv" or "jsonl")."""
+    if file_format not in READERS:
+        raise ImportFormatError(f"unsupported format '{file_format}'")
+    try:
+        return import_items(READERS[file_format](stream), update_existing=update_existing, batch_size=batch_size)
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(str(exc)) from exc
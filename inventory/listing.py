@@ -0,0 +1,151 @@
+"""Server-side listing of inventory items with keyset pagination.
+
+The index page used to render every item and sort/filter the DOM in the
+browser. Here filtering and sorting happen in SQL and pages are fetched with a
+keyset cursor (``sort value``, ``id``) instead of an OFFSET, so every page costs
+the same regardless of how far the user has scrolled.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional
+
+from django.db.models import F, Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from . import search
+from .models import Item, Location, Tag
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sort keys exposed to the client mapped to the column used in SQL
+SORT_FIELDS = {
+    "name": "name",
+    "desired": "desired_quantity",
+    "current": "current_quantity",
+    "missing": "missing_quantity",
+}
+
+
+@dataclass
+class ListingParams:
+    q: str = ""
+    tag: Optional[int] = None
+    location: Optional[int] = None
+    sort: str = "name"
+    direction: str = "asc"
+    cursor: Optional[str] = None
+    limit: int = PAGE_SIZE
+
+    @classmethod
+    def from_query(cls, query: Mapping[str, str]) -> "ListingParams":
+        """Build listing parameters from request GET data, ignoring invalid values."""
+        sort = query.get("sort", "name")
+        direction = query.get("dir", "asc")
+        return cls(
+            q=query.get("q", "").strip(),
+            tag=_parse_int(query.get("tag")),
+            location=_parse_int(query.get("location")),
+            sort=sort if sort in SORT_FIELDS else "name",
+            direction=direction if direction in ("asc", "desc") else "asc",
+            cursor=query.get("after") or None,
+            limit=min(max(_parse_int(query.get("limit")) or PAGE_SIZE, 1), MAX_PAGE_SIZE),
+        )
+
+
+@dataclass
+class ListingPage:
+    items: List[Item]
+    next_cursor: Optional[str]
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_cursor(value: Any, pk: int) -> str:
+    raw = json.dumps([value, pk], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[tuple]:
+    """Decode a cursor produced by ``encode_cursor``; return None if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return value, int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _valid_cursor_value(field: str, value: Any) -> bool:
+    """Whether ``value`` can be compared with ``field``; a stale or edited cursor may not."""
+    if field == "name":
+        return isinstance(value, str)
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def filtered_items(params: ListingParams) -> QuerySet[Item]:
+    """Return the items matching the text/tag/location filters."""
+    items = Item.objects.all()
+
+    matching = search.item_ids_sql(params.q) if params.q else None
+    if matching is not None:
+        items = items.filter(id__in=RawSQL(*matching))
+    elif params.q:
+        # Subqueries instead of joins keep one row per item without DISTINCT
+        tagged = Tag.objects.filter(name__icontains=params.q).values("item")
+        located = Location.objects.filter(name__icontains=params.q).values("item")
+        items = items.filter(
+            Q(name__icontains=params.q) | Q(id__in=tagged) | Q(id__in=located)
+        )
+
+    if params.tag:
+        items = items.filter(tags__id=params.tag)
+    if params.location:
+        items = items.filter(locations__id=params.location)
+
+    return items
+
+
+def fetch_page(params: ListingParams) -> ListingPage:
+    """Fetch one page of items after ``params.cursor`` in the requested order.
+
+    A cursor that is malformed or does not fit the sort field is ignored and
+    the first page is returned.
+    """
+    field = SORT_FIELDS[params.sort]
+    descending = params.direction == "desc"
+    items = filtered_items(params)
+
+    decoded = decode_cursor(params.cursor) if params.cursor else None
+    if decoded is not None and _valid_cursor_value(field, decoded[0]):
+        value, pk = decoded
+        after = "lt" if descending else "gt"
+        items = items.filter(
+            Q(**{f"{field}__{after}": value}) | Q(**{field: value, f"id__{after}": pk})
+        )
+
+    if descending:
+        items = items.order_by(F(field).desc(), "-id")
+    else:
+        items = items.order_by(F(field).asc(), "id")
+
+    # One extra row tells us whether another page exists without a COUNT(*)
+    rows = list(items.prefetch_related("locations", "tags")[: params.limit + 1])
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.id)
+
+    return ListingPage(items=rows, next_cursor=next_cursor)
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory.models import Item, Location, Tag
+
+
+def hot_queries():
+    """``(description, queryset, index the plan should use)`` for the app's frequent lookups."""
+    return [
+        ('Item by name, any case', Item.objects.named('milk'), 'item_name_key_unique'),
+        ('Tag by name, any case', Tag.objects.named('dairy'), 'tag_name_key_unique'),
+        ('Location by name, any case', Location.objects.named('fridge'), 'location_name_key_unique'),
+        (
+            'Shopping list',
+            Item.objects.filter(missing_quantity__gt=0).order_by('name').values_list('name', 'missing_quantity'),
+            'item_shopping_list_idx',
+        ),
+        ('Listing sorted by missing', Item.objects.order_by('missing_quantity', 'id')[:50], 'item_missing_idx'),
+        (
+            'Items with a tag',
+            Item.tags.through.objects.filter(tag_id=1).values_list('item_id', flat=True),
+            'item_tags_tag_item_idx',
+        ),
+        (
+            'Items in a location',
+            Item.locations.through.objects.filter(location_id=1).values_list('item_id', flat=True),
+            'item_locations_location_item_idx',
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Report hot queries whose query plan does not use the expected index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the full query plan of every query',
+        )
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Exit with an error if any index is missing or unused',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Checking query plans on {connection.vendor}')
+        missing = 0
+        for description, queryset, index in hot_queries():
+            plan = queryset.explain()
+            if index in plan:
+                self.stdout.write(self.style.SUCCESS(f'OK       {description} uses {index}'))
+            else:
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'MISSING  {description} does not use {index}'))
+            if options['plans'] or index not in plan:
+                for line in plan.splitlines():
+                    self.stdout.write(f'           {line}')
+
+        if missing and options['fail']:
+            raise CommandError(f'{missing} hot queries do not use their index; run "manage.py migrate"?')
+        if not missing:
+            self.stdout.write(self.style.SUCCESS('All hot queries use their indexes.'))
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk import items with their tags and locations from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' to read from standard input")
+        parser.add_argument(
+            '--format',
+            choices=importer.FORMATS,
+            help='Input format (detected from the file extension by default, csv otherwise)',
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Overwrite quantities of existing items and add their tags and locations instead of skipping them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help=f'Rows per INSERT statement (default {importer.BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or importer.detect_format(path)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        try:
+            if path == '-':
+                stream = importer.text_stream(sys.stdin.buffer)
+            else:
+                stream = importer.text_stream(open(path, 'rb'))
+        except OSError as exc:
+            raise CommandError(f'Cannot open {path}: {exc}') from exc
+
+        with stream:
+            try:
+                result = importer.import_file(
+                    stream,
+                    file_format,
+                    update_existing=options['update'],
+                    batch_size=options['batch_size'],
+                )
+            except importer.ImportFormatError as exc:
+                raise CommandError(f'Import failed, nothing was written: {exc}') from exc
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f'Skipped {error}'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {result.created} new items, updated {result.updated}, skipped {result.skipped}; '
+                f'created {result.tags_created} tags and {result.locations_created} locations.'
+            )
+        )
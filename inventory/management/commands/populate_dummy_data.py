@@ -1,6 +1,5 @@
 import random
 from django.core.management.base import BaseCommand
-from django.db import models
 from inventory.models import Item, Tag, Location
 
 
@@ -36,7 +35,7 @@ class Command(BaseCommand):
         
         locations = []
         for name in location_names:
-            location, created = Location.objects.get_or_create(name=name)
+            location, created = Location.objects.get_or_create_named(name)
             locations.append(location)
             if created:
                 self.stdout.write(f'Created location: {name}')
@@ -52,7 +51,7 @@ class Command(BaseCommand):
         
         tags = []
         for name in tag_names:
-            tag, created = Tag.objects.get_or_create(name=name)
+            tag, created = Tag.objects.get_or_create_named(name)
             tags.append(tag)
             if created:
                 self.stdout.write(f'Created tag: {name}')
@@ -115,12 +114,10 @@ class Command(BaseCommand):
             current_qty = random.randint(0, desired_qty + 5)
             
             # Create the item
-            item, created = Item.objects.get_or_create(
-                name=item_name,
-                defaults={
-                    'desired_quantity': desired_qty,
-                    'current_quantity': current_qty
-                }
+            item, created = Item.objects.get_or_create_named(
+                item_name,
+                desired_quantity=desired_qty,
+                current_quantity=current_qty,
             )
             
             if created:
@@ -146,7 +143,7 @@ class Command(BaseCommand):
         
         # Print some statistics
         total_items = Item.objects.count()
-        missing_items = Item.objects.filter(current_quantity__lt=models.F('desired_quantity')).count()
+        missing_items = Item.objects.filter(missing_quantity__gt=0).count()
         
         self.stdout.write(f'Total items in database: {total_items}')
         self.stdout.write(f'Items needing restocking: {missing_items}')
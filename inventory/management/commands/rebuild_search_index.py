@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for items, tags and locations'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(
+                self.style.WARNING(
+                    'Full-text search index is not available on this database; '
+                    'searches fall back to substring matching.'
+                )
+            )
+            return
+
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt successfully!'))
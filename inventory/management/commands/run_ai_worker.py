@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from inventory.ai import clients, jobs
+
+# Seconds between looking for stale jobs and purging old ones
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued AI consumption analyses, several at a time on one event loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'AI_WORKER_CONCURRENCY', 4),
+            help='Analyses run at the same time (default AI_WORKER_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'AI_WORKER_POLL_INTERVAL', 1.0),
+            help='Seconds to wait before looking again when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of waiting for new jobs',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive')
+        self.stdout.write(f"AI worker running {options['concurrency']} analyses at a time")
+        try:
+            processed = asyncio.run(self.serve(options['concurrency'], options['poll_interval'], options['once']))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped, unfinished analyses were queued again')
+            return
+        self.stdout.write(self.style.SUCCESS(f'AI worker stopped after {processed} jobs'))
+
+    async def serve(self, concurrency: int, poll_interval: float, once: bool) -> int:
+        """Claim jobs while fewer than ``concurrency`` are running; return how many were run."""
+        # Database work runs in asgiref's sync thread, the model calls on this loop
+        free = asyncio.Semaphore(concurrency)
+        running = set()
+        processed = 0
+        next_housekeeping = 0.0
+        worker = jobs.worker_name()
+        try:
+            while True:
+                if time.monotonic() >= next_housekeeping:
+                    requeued = await sync_to_async(jobs.requeue_stale)()
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f'Requeued or failed {requeued} stale jobs'))
+                    await sync_to_async(jobs.purge)()
+                    next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+                await free.acquire()
+                job = await sync_to_async(jobs.claim)(worker)
+                if job is None:
+                    free.release()
+                    await sync_to_async(close_old_connections)()
+                    if once:
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+                processed += 1
+                task = asyncio.create_task(self.work(job, free))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            await asyncio.gather(*running)
+        finally:
+            for task in list(running):
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            # Including a job claimed just as the worker was interrupted
+            await sync_to_async(jobs.release)(worker)
+            await clients.aclose()
+        return processed
+
+    async def work(self, job, free: asyncio.Semaphore) -> None:
+        try:
+            job = await jobs.run(job)
+            self.stdout.write(f'{job.id}: {job.status} ({job.source or job.error})')
+        finally:
+            free.release()
@@ -1,31 +1,82 @@
-from django.core.management.base import BaseCommand
-from inventory.models import Tag, Location
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory import versioning
+from inventory.models import Location, Tag, UserSettings
 
 
 class Command(BaseCommand):
     help = 'Update existing tags and locations with colors and emojis'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per UPDATE statement (default 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing anything',
+        )
+
     def handle(self, *args, **options):
-        # Update all existing tags
-        tag_count = 0
-        for tag in Tag.objects.all():
-            # Force re-assignment by resetting color
-            tag.color = '#6b7280'
-            tag.save()  # This will trigger the auto-assignment
-            tag_count += 1
-            self.stdout.write(f'Updated tag: {tag.name} -> {tag.emoji} {tag.color}')
-
-        # Update all existing locations
-        location_count = 0
-        for location in Location.objects.all():
-            # Force re-assignment by resetting color
-            location.color = '#6b7280'
-            location.save()  # This will trigger the auto-assignment
-            location_count += 1
-            self.stdout.write(f'Updated location: {location.name} -> {location.emoji} {location.color}')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        dry_run = options['dry_run']
+        # Per-row lines only with -v 2; the summary is always printed
+        self.verbose = options['verbosity'] >= 2
+
+        settings = UserSettings.get_settings()
+        with transaction.atomic():
+            tag_count, tag_total = self.reclassify(Tag, 'tag', settings, batch_size, dry_run)
+            location_count, location_total = self.reclassify(Location, 'location', settings, batch_size, dry_run)
 
+            scopes = []
+            if tag_count:
+                scopes.append(versioning.TAGS)
+            if location_count:
+                scopes.append(versioning.LOCATIONS)
+            if scopes and not dry_run:
+                # bulk_update does not send the signals that bump these
+                versioning.bump(*scopes)
+
+        verb = 'Would update' if dry_run else 'Successfully updated'
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully updated {tag_count} tags and {location_count} locations!'
+                f'{verb} {tag_count} of {tag_total} tags and {location_count} of {location_total} locations!'
             )
         )
+
+    def reclassify(self, model, label, settings, batch_size, dry_run):
+        """Recompute colour and emoji of every row and write only the changed ones.
+
+        Returns ``(changed, total)``.
+        """
+        changed = 0
+        total = 0
+        pending = []
+        rows = model.objects.order_by('id').only('id', 'name', 'color', 'emoji')
+        for obj in rows.iterator(chunk_size=batch_size):
+            total += 1
+            old = (obj.color, obj.emoji)
+            # An empty colour forces the pattern lookup, falling back to the user's defaults
+            obj.color = ''
+            obj.apply_default_style(settings)
+            if (obj.color, obj.emoji) == old:
+                continue
+
+            changed += 1
+            if self.verbose:
+                self.stdout.write(f'Updated {label}: {obj.name} -> {obj.emoji} {obj.color}')
+            if not dry_run:
+                pending.append(obj)
+                if len(pending) >= batch_size:
+                    model.objects.bulk_update(pending, ['color', 'emoji'])
+                    pending = []
+
+        if pending:
+            model.objects.bulk_update(pending, ['color', 'emoji'])
+        return changed, total
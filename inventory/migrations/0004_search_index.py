@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases use the icontains fallback in inventory.search
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_search USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, name, context, tokenize = 'trigram')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer)
+        return
+    schema_editor.execute(
+        "INSERT INTO inventory_search (kind, object_id, name, context) "
+        "SELECT 'tag', id, name, '' FROM inventory_tag"
+    )
+    schema_editor.execute(
+        "INSERT INTO inventory_search (kind, object_id, name, context) "
+        "SELECT 'location', id, name, '' FROM inventory_location"
+    )
+    schema_editor.execute(
+        "INSERT INTO inventory_search (kind, object_id, name, context) "
+        "SELECT 'item', i.id, i.name, "
+        "COALESCE((SELECT group_concat(t.name, ' ') FROM inventory_tag t "
+        "JOIN inventory_item_tags it ON it.tag_id = t.id WHERE it.item_id = i.id), '') "
+        "|| ' ' || "
+        "COALESCE((SELECT group_concat(l.name, ' ') FROM inventory_location l "
+        "JOIN inventory_item_locations il ON il.location_id = l.id WHERE il.item_id = i.id), '') "
+        "FROM inventory_item i"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS inventory_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_usersettings'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+def seed_scopes(apps, schema_editor):
+    ChangeStamp = apps.get_model('inventory', 'ChangeStamp')
+    ChangeStamp.objects.bulk_create(
+        [ChangeStamp(scope=scope, version=1) for scope in ('items', 'tags', 'locations', 'settings', 'inventory')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('scope', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_scopes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:38
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_changestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='missing_quantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Greatest(django.db.models.expressions.CombinedExpression(models.F('desired_quantity'), '-', models.F('current_quantity')), models.Value(0)), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('missing_quantity__gt', 0)), fields=['name', 'missing_quantity'], name='item_shopping_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['missing_quantity', 'id'], name='item_missing_idx'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:50
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_case_duplicates(apps, schema_editor):
+    """Make names unique ignoring case before the constraints are added.
+
+    Tags and locations that differ only in case are merged into the oldest
+    one, items get a numbered suffix since their quantities cannot be merged.
+    These updates bypass the signals that keep the search index in sync, so
+    the index is rebuilt afterwards if anything changed.
+    """
+    from django.db.models import Count
+    from django.db.models.functions import Lower
+
+    from inventory import search
+
+    changed = False
+
+    Item = apps.get_model('inventory', 'Item')
+    for model_name, field in (('Tag', 'tag'), ('Location', 'location')):
+        model = apps.get_model('inventory', model_name)
+        through = getattr(Item, f'{field}s').through
+        duplicates = (
+            model.objects.annotate(name_lower=Lower('name'))
+            .values('name_lower')
+            .annotate(count=Count('id'))
+            .filter(count__gt=1)
+            .values_list('name_lower', flat=True)
+        )
+        for name_lower in list(duplicates):
+            labels = list(model.objects.annotate(name_lower=Lower('name')).filter(name_lower=name_lower).order_by('id'))
+            keep, extra = labels[0], [label.id for label in labels[1:]]
+            item_ids = set(through.objects.filter(**{f'{field}_id__in': extra}).values_list('item_id', flat=True))
+            through.objects.bulk_create(
+                [through(item_id=item_id, **{f'{field}_id': keep.id}) for item_id in item_ids],
+                ignore_conflicts=True,
+            )
+            model.objects.filter(id__in=extra).delete()
+            changed = True
+
+    duplicates = (
+        Item.objects.annotate(name_lower=Lower('name'))
+        .values('name_lower')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('name_lower', flat=True)
+    )
+    taken = {name.lower() for name in Item.objects.values_list('name', flat=True)}
+    for name_lower in list(duplicates):
+        items = list(Item.objects.annotate(name_lower=Lower('name')).filter(name_lower=name_lower).order_by('id'))
+        for item in items[1:]:
+            number = 2
+            while f'{item.name} ({number})'.lower() in taken:
+                number += 1
+            suffix = f' ({number})'
+            item.name = item.name[:200 - len(suffix)] + suffix
+            taken.add(item.name.lower())
+            item.save(update_fields=['name'])
+            changed = True
+
+    if changed:
+        search.rebuild(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_item_missing_quantity'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='item_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='location_name_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='tag_name_ci_unique'),
+        ),
+        # Auto-created through tables only index (item, label) and label alone;
+        # these cover "items with this tag/location" without touching the table.
+        migrations.RunSQL(
+            'CREATE INDEX item_tags_tag_item_idx ON inventory_item_tags (tag_id, item_id)',
+            'DROP INDEX item_tags_tag_item_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX item_locations_location_item_idx ON inventory_item_locations (location_id, item_id)',
+            'DROP INDEX item_locations_location_item_idx',
+        ),
+    ]
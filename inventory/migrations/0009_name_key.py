@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_name_keys(apps, schema_editor):
+    """Store the casefolded names, merging names that only now compare equal.
+
+    0007 compared names with the database's ``lower()``, which on SQLite only
+    folds ASCII, so "Čaj" and "čaj" may both exist. Labels are merged into the
+    oldest one and items get a numbered suffix, as in 0007, and the search
+    index is rebuilt afterwards if anything changed.
+    """
+    from inventory import search
+
+    changed = False
+
+    Item = apps.get_model('inventory', 'Item')
+    for model_name, field in (('Tag', 'tag'), ('Location', 'location')):
+        model = apps.get_model('inventory', model_name)
+        through = getattr(Item, f'{field}s').through
+        groups = defaultdict(list)
+        for label in model.objects.order_by('id'):
+            groups[label.name.casefold()].append(label)
+        for key, labels in groups.items():
+            keep, extra = labels[0], [label.id for label in labels[1:]]
+            if extra:
+                item_ids = set(through.objects.filter(**{f'{field}_id__in': extra}).values_list('item_id', flat=True))
+                through.objects.bulk_create(
+                    [through(item_id=item_id, **{f'{field}_id': keep.id}) for item_id in item_ids],
+                    ignore_conflicts=True,
+                )
+                model.objects.filter(id__in=extra).delete()
+                changed = True
+            keep.name_key = key
+        model.objects.bulk_update([labels[0] for labels in groups.values()], ['name_key'])
+
+    items = list(Item.objects.order_by('id'))
+    taken = set()
+    for item in items:
+        key = item.name.casefold()
+        if key in taken:
+            number = 2
+            while f'{item.name} ({number})'.casefold() in taken:
+                number += 1
+            suffix = f' ({number})'
+            item.name = item.name[:200 - len(suffix)] + suffix
+            key = item.name.casefold()
+            changed = True
+        taken.add(key)
+        item.name_key = key
+    Item.objects.bulk_update(items, ['name', 'name_key'], batch_size=500)
+
+    if changed:
+        search.rebuild(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_aijob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=600),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=600),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=600),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='item',
+            name='item_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='location',
+            name='location_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='tag',
+            name='tag_name_ci_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(models.F('name_key'), name='item_name_key_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(models.F('name_key'), name='location_name_key_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(models.F('name_key'), name='tag_name_key_unique'),
+        ),
+    ]
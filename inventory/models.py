@@ -1,81 +1,37 @@
-import re
-from django.db import models
-from django.core.cache import cache
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+
+from . import classifier
 
 
 def get_tag_color_and_emoji(name: str) -> tuple[str, str]:
     """Automatically assign color and emoji based on tag name."""
-    name_lower = name.lower().strip()
-    
-    # Define color and emoji mappings
-    mappings = {
-        # Food categories
-        r'(vegetables?|veggie|green|lettuce|spinach|broccoli|cabbage)': ('#22c55e', '🥬'),
-        r'(fruits?|apple|banana|orange|berry|grape|citrus)': ('#f59e0b', '🍎'),
-        r'(meat|beef|chicken|pork|protein|bacon|ham)': ('#dc2626', '🥩'),
-        r'(dairy|milk|cheese|yogurt|butter|cream)': ('#3b82f6', '🥛'),
-        r'(grain|bread|rice|pasta|cereal|wheat)': ('#a16207', '🌾'),
-        r'(beverage|drink|juice|soda|coffee|tea|water)': ('#06b6d4', '🧃'),
-        r'(snack|chip|cookie|candy|chocolate)': ('#f97316', '🍿'),
-        r'(frozen|ice|cold)': ('#0ea5e9', '❄️'),
-        r'(spice|seasoning|salt|pepper|herb)': ('#7c2d12', '🧂'),
-        r'(condiment|sauce|ketchup|mustard|mayo)': ('#eab308', '🍯'),
-        r'(baking|flour|sugar|vanilla)': ('#e879f9', '🧁'),
-        r'(canned|jarred|preserved)': ('#6b7280', '🥫'),
-        r'(organic|natural|healthy)': ('#16a34a', '🌱'),
-        r'(vegan|plant)': ('#15803d', '🌿'),
-        r'(gluten.?free|gf)': ('#a855f7', '🌾'),
-        r'(vitamin|supplement|health)': ('#059669', '💊'),
-        r'(breakfast|morning)': ('#fbbf24', '🌅'),
-        r'(lunch|noon)': ('#fb923c', '🌞'),
-        r'(dinner|evening)': ('#7c3aed', '🌙'),
-        r'(dessert|sweet)': ('#ec4899', '🍰'),
-        r'(bulk|large|big)': ('#374151', '📦'),
-        r'(fresh|new)': ('#10b981', '✨'),
-        r'(dried|dry)': ('#92400e', '🏜️'),
-        r'(low.?fat|diet)': ('#84cc16', '⚖️'),
-        r'(high.?protein|protein)': ('#dc2626', '💪'),
-    }
-    
-    # Check each pattern
-    for pattern, (color, emoji) in mappings.items():
-        if re.search(pattern, name_lower):
-            return color, emoji
-    
     # Default fallback - will be overridden by UserSettings in the model save method
-    return '#6b7280', '🏷️'
+    return classifier.classify("tag", name)
 
 
 def get_location_color_and_emoji(name: str) -> tuple[str, str]:
     """Automatically assign color and emoji based on location name."""
-    name_lower = name.lower().strip()
-    
-    # Define color and emoji mappings for locations
-    mappings = {
-        r'(fridge|refrigerat)': ('#3b82f6', '🧊'),
-        r'(freezer|frozen)': ('#0ea5e9', '❄️'),
-        r'(pantry|cabinet|cupboard)': ('#a16207', '🏠'),
-        r'(counter|kitchen)': ('#6b7280', '🏠'),
-        r'(basement|cellar|storage)': ('#374151', '🏚️'),
-        r'(garage)': ('#525252', '🏠'),
-        r'(wine|alcohol)': ('#7c2d12', '🍷'),
-        r'(spice|seasoning)': ('#ea580c', '🧂'),
-        r'(bread|bakery)': ('#d97706', '🍞'),
-        r'(fruit|produce)': ('#f59e0b', '🍎'),
-        r'(vegetable|veggie)': ('#22c55e', '🥬'),
-        r'(meat|protein)': ('#dc2626', '🥩'),
-        r'(cheese|dairy)': ('#3b82f6', '🧀'),
-        r'(door|shelf)': ('#6b7280', '🚪'),
-        r'(drawer)': ('#8b5cf6', '📦'),
-    }
-    
-    # Check each pattern
-    for pattern, (color, emoji) in mappings.items():
-        if re.search(pattern, name_lower):
-            return color, emoji
-    
     # Default fallback - will be overridden by UserSettings in the model save method
-    return '#6b7280', '📍'
+    return classifier.classify("location", name)
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Read-only copy of the ``UserSettings`` defaults shared within a process."""
+    default_tag_color: str
+    default_tag_emoji: str
+    default_location_color: str
+    default_location_emoji: str
+
+
+# (settings version, snapshot) of this process
+_settings_snapshot: Optional[Tuple[int, SettingsSnapshot]] = None
 
 
 class UserSettings(models.Model):
@@ -111,36 +67,118 @@ class UserSettings(models.Model):
             self.pk = existing.pk
         else:
             super().save(*args, **kwargs)
-        
-        # Clear cache when settings are updated
-        cache.delete('user_settings')
+        # The post_save signal bumps the settings version, which retires every process's snapshot
     
     @classmethod
-    def get_settings(cls):
-        """Get the user settings, creating default ones if they don't exist."""
-        settings = cache.get('user_settings')
-        if settings is None:
-            settings, _ = cls.objects.get_or_create(defaults={
-                'default_tag_color': '#6b7280',
-                'default_tag_emoji': '🏷️',
-                'default_location_color': '#6b7280',
-                'default_location_emoji': '📍',
-            })
-            cache.set('user_settings', settings, 300)  # Cache for 5 minutes
+    def load(cls) -> "UserSettings":
+        """Get the user settings row for editing, creating default ones if they don't exist."""
+        settings, _ = cls.objects.get_or_create(defaults={
+            'default_tag_color': '#6b7280',
+            'default_tag_emoji': '🏷️',
+            'default_location_color': '#6b7280',
+            'default_location_emoji': '📍',
+        })
         return settings
     
+    @classmethod
+    def get_settings(cls) -> SettingsSnapshot:
+        """Get the current defaults as an immutable snapshot.
+
+        The snapshot is kept per process and reloaded only when the settings
+        ``ChangeStamp`` version moves, so a save in any worker is seen by all
+        of them on their next call at the cost of one primary-key lookup.
+        """
+        global _settings_snapshot
+        from . import versioning
+
+        # Read the version first so a concurrent save can only make the snapshot reload early
+        version = versioning.get(versioning.SETTINGS)
+        current = _settings_snapshot
+        if current is not None and current[0] == version:
+            return current[1]
+
+        settings = cls.load()
+        snapshot = SettingsSnapshot(
+            default_tag_color=settings.default_tag_color,
+            default_tag_emoji=settings.default_tag_emoji,
+            default_location_color=settings.default_location_color,
+            default_location_emoji=settings.default_location_emoji,
+        )
+        _settings_snapshot = (version, snapshot)
+        return snapshot
+    
     def __str__(self):
         return "User Settings"
 
 
-class Tag(models.Model):
+def name_key(name: str) -> str:
+    """The form names are compared in, so "Dairy" and "dairy" or "Čaj" and "čaj" are one name."""
+    return name.casefold()
+
+
+class NamedQuerySet(models.QuerySet):
+    """Case-insensitive name lookups, answered by the unique ``name_key`` indexes.
+
+    The key is folded in Python rather than with the database's ``lower()``,
+    which on SQLite only folds ASCII letters.
+    """
+
+    def named(self, name: str) -> "NamedQuerySet":
+        return self.filter(name_key=name_key(name))
+
+    def named_any(self, names) -> "NamedQuerySet":
+        return self.filter(name_key__in=[name_key(name) for name in names])
+
+    def get_or_create_named(self, name: str, **defaults) -> tuple:
+        """Like ``get_or_create(name=name)``, but "Dairy" finds "dairy"."""
+        existing = self.named(name).first()
+        if existing is not None:
+            return existing, False
+        try:
+            with transaction.atomic():
+                return self.create(name=name, **defaults), True
+        except IntegrityError:
+            # Created concurrently under another spelling
+            return self.named(name).get(), False
+
+
+class NamedModel(models.Model):
+    """A model whose ``name`` is unique ignoring case.
+
+    ``save()`` keeps ``name_key`` in step with ``name``; code that bypasses it
+    (``bulk_create``, ``QuerySet.update``) has to set the key itself.
+    """
+    # casefold() can make a name up to three times longer
+    name_key = models.CharField(max_length=600, editable=False)
+
+    objects = NamedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        constraints = [
+            # An expression keeps it a named index on SQLite too, see check_indexes
+            models.UniqueConstraint(F("name_key"), name="%(class)s_name_key_unique"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.name_key = name_key(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        super().save(*args, **kwargs)
+
+
+class Tag(NamedModel):
     name = models.CharField(max_length=100, unique=True)
     color = models.CharField(max_length=7, default='#6b7280')  # Hex color
     emoji = models.CharField(max_length=10, default='🏷️')
 
-    def save(self, *args, **kwargs):
-        # Auto-assign color and emoji if not already set or if they are still default values
-        settings = UserSettings.get_settings()
+    def apply_default_style(self, settings=None) -> None:
+        """Auto-assign color and emoji if not already set or if they are still default values.
+
+        Pass ``settings`` when styling many tags at once (e.g. before ``bulk_create``).
+        """
+        settings = settings or UserSettings.get_settings()
         default_color = settings.default_tag_color
         default_emoji = settings.default_tag_emoji
         
@@ -151,20 +189,26 @@ class Tag(models.Model):
                 self.color, self.emoji = pattern_color, pattern_emoji
             else:  # No pattern found, use user's defaults
                 self.color, self.emoji = default_color, default_emoji
+
+    def save(self, *args, **kwargs):
+        self.apply_default_style()
         super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return self.name
 
 
-class Location(models.Model):
+class Location(NamedModel):
     name = models.CharField(max_length=100, unique=True)
     color = models.CharField(max_length=7, default='#6b7280')  # Hex color
     emoji = models.CharField(max_length=10, default='📍')
 
-    def save(self, *args, **kwargs):
-        # Auto-assign color and emoji if not already set or if they are still default values
-        settings = UserSettings.get_settings()
+    def apply_default_style(self, settings=None) -> None:
+        """Auto-assign color and emoji if not already set or if they are still default values.
+
+        Pass ``settings`` when styling many locations at once (e.g. before ``bulk_create``).
+        """
+        settings = settings or UserSettings.get_settings()
         default_color = settings.default_location_color
         default_emoji = settings.default_location_emoji
         
@@ -175,23 +219,95 @@ class Location(models.Model):
                 self.color, self.emoji = pattern_color, pattern_emoji
             else:  # No pattern found, use user's defaults
                 self.color, self.emoji = default_color, default_emoji
+
+    def save(self, *args, **kwargs):
+        self.apply_default_style()
         super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return self.name
 
 
-class Item(models.Model):
+class Item(NamedModel):
     name = models.CharField(max_length=200, unique=True)
     desired_quantity = models.PositiveIntegerField(default=0)
     current_quantity = models.PositiveIntegerField(default=0)
+    # Computed by the database so set-based updates can never leave it stale
+    missing_quantity = models.GeneratedField(
+        expression=Greatest(F("desired_quantity") - F("current_quantity"), Value(0)),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
     locations = models.ManyToManyField(Location, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
 
-    @property
-    def missing_quantity(self) -> int:
-        missing = int(self.desired_quantity) - int(self.current_quantity)
-        return missing if missing > 0 else 0
+    class Meta(NamedModel.Meta):
+        indexes = [
+            # Partial covering index: the shopping list only reads rows with missing > 0
+            models.Index(
+                fields=["name", "missing_quantity"],
+                condition=Q(missing_quantity__gt=0),
+                name="item_shopping_list_idx",
+            ),
+            models.Index(fields=["missing_quantity", "id"], name="item_missing_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.name
+
+
+class ChangeStamp(models.Model):
+    """Version counter per data scope, bumped on every write to that scope.
+
+    Per-process caches remember the version they were built from and rebuild
+    when it moves, which keeps them correct across workers. Reading a stamp is
+    a single primary key lookup.
+    """
+    scope = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.scope}@{self.version}"
+
+
+class AIJob(models.Model):
+    """A consumption analysis waiting for, or answered by, the AI worker.
+
+    The web process only inserts a row and reads it back; ``manage.py
+    run_ai_worker`` claims queued rows and stores the suggestions, so a slow
+    model never holds an HTTP request open. See ``inventory.ai.jobs``.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    user_input = models.TextField()
+    language = models.CharField(max_length=10, default="en")
+    # [{id, name, consumed}] once done; where it came from ("offline", "hit", "miss")
+    suggestions = models.JSONField(null=True, blank=True)
+    source = models.CharField(max_length=10, blank=True)
+    error = models.TextField(blank=True)
+    error_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job and look for stale running ones
+            models.Index(fields=["status", "created_at"], name="aijob_status_idx"),
+        ]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self) -> str:
+        return f"{self.id} ({self.status})"
@@ -0,0 +1,224 @@
+"""Set-based quantity changes.
+
+A batch of changes is written in one transaction with a single UPDATE whose
+``CASE`` computes each item's new quantity from its current database value, so
+a decrement can never be lost to a concurrent write from another device and is
+clamped at zero by the database. Only the changed column is written, and where
+the database supports ``UPDATE ... RETURNING`` the new quantities come back
+from the same statement. ``QuerySet.update`` and raw updates skip the model
+signals, so the item version stamp is bumped explicitly.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from . import versioning
+from .models import Item
+
+
+@dataclass
+class QuantityChange:
+    """Either an absolute ``quantity`` or a relative ``delta`` for one item."""
+    id: int
+    quantity: Optional[int] = None
+    delta: int = 0
+
+    def then(self, other: "QuantityChange") -> "QuantityChange":
+        """Combine with a later change to the same item."""
+        if other.quantity is not None:
+            return other
+        return QuantityChange(self.id, self.quantity, self.delta + other.delta)
+
+    def expression(self, field: str = "current_quantity"):
+        if self.quantity is not None:
+            return Value(self.target)
+        return Greatest(F(field) + self.delta, Value(0))
+
+    @property
+    def target(self) -> Optional[int]:
+        """The absolute value to write, or None for a relative change."""
+        if self.quantity is None:
+            return None
+        return max(0, self.quantity + self.delta)
+
+
+def parse_change(change: dict) -> QuantityChange:
+    """Read one change sent by the consume page.
+
+    An explicit ``delta`` wins. Otherwise the difference between
+    ``suggested_new_quantity`` and the ``current_quantity`` the client saw is
+    applied, so edits made elsewhere in the meantime are kept. Without a
+    ``current_quantity`` the suggested value is written as is.
+
+    Raises ``ValueError`` or ``TypeError`` for malformed input.
+    """
+    item_id = change.get("id")
+    if item_id is None or isinstance(item_id, bool):
+        raise ValueError("missing id")
+    item_id = int(item_id)
+
+    if change.get("delta") is not None:
+        return QuantityChange(item_id, delta=int(change["delta"]))
+
+    new_quantity = int(change.get("suggested_new_quantity", 0))
+    if new_quantity < 0:
+        raise ValueError("negative quantity")
+    if change.get("current_quantity") is not None:
+        return QuantityChange(item_id, delta=new_quantity - int(change["current_quantity"]))
+    return QuantityChange(item_id, quantity=new_quantity)
+
+
+# Columns the adjust endpoint may write
+QUANTITY_FIELDS = ("current_quantity", "desired_quantity")
+
+
+def parse_adjustment(adjustment: dict) -> QuantityChange:
+    """Read ``{"id": ..., "op": "increment" | "decrement" | "set", "amount": ...}``.
+
+    ``op`` defaults to increment and ``amount`` to 1. Raises ``ValueError``
+    or ``TypeError`` for malformed input.
+    """
+    item_id = adjustment.get("id")
+    if item_id is None or isinstance(item_id, bool):
+        raise ValueError("missing id")
+    op = adjustment.get("op", "increment")
+    amount = int(adjustment.get("amount", 1))
+    if amount < 0:
+        raise ValueError("negative amount")
+
+    if op == "increment":
+        return QuantityChange(int(item_id), delta=amount)
+    if op == "decrement":
+        return QuantityChange(int(item_id), delta=-amount)
+    if op == "set":
+        return QuantityChange(int(item_id), quantity=amount)
+    raise ValueError(f"unknown op {op!r}")
+
+
+def merge(changes: Iterable[QuantityChange]) -> Dict[int, QuantityChange]:
+    merged: Dict[int, QuantityChange] = {}
+    for change in changes:
+        merged[change.id] = merged[change.id].then(change) if change.id in merged else change
+    return merged
+
+
+def apply(changes: Iterable[QuantityChange]) -> Tuple[List[dict], List[int]]:
+    """Apply ``changes`` atomically.
+
+    Returns the per-item results (id, name, old and new quantity) in item name
+    order, and the ids that do not exist.
+    """
+    merged = merge(changes)
+    if not merged:
+        return [], []
+
+    with transaction.atomic():
+        items = (
+            Item.objects.select_for_update()
+            .filter(id__in=merged)
+            .order_by("name")
+            .values_list("id", "name", "current_quantity")
+        )
+        old = {item_id: (name, quantity) for item_id, name, quantity in items}
+        missing = [item_id for item_id in merged if item_id not in old]
+        if not old:
+            return [], missing
+
+        Item.objects.filter(id__in=old).update(
+            current_quantity=Case(
+                *[When(id=item_id, then=merged[item_id].expression()) for item_id in old],
+                default=F("current_quantity"),
+                output_field=IntegerField(),
+            )
+        )
+        new = dict(Item.objects.filter(id__in=old).values_list("id", "current_quantity"))
+        versioning.bump(versioning.ITEMS)
+
+    results = [
+        {"id": item_id, "name": name, "old_quantity": quantity, "new_quantity": new[item_id]}
+        for item_id, (name, quantity) in old.items()
+    ]
+    return results, missing
+
+
+RETURNED_FIELDS = ("id", "current_quantity", "desired_quantity", "missing_quantity")
+
+
+def _can_update_returning() -> bool:
+    """Whether ``UPDATE ... RETURNING`` is available on this connection.
+
+    Django has no feature flag for it; INSERT support is not enough since
+    MariaDB returns from INSERT and DELETE only. SQLite has both from 3.35.
+    """
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.features.can_return_columns_from_insert
+
+
+def _update_returning(merged: Dict[int, QuantityChange], field: str) -> List[tuple]:
+    """One ``UPDATE ... RETURNING`` touching only ``field``."""
+    quote = connection.ops.quote_name
+    column = quote(field)
+    greatest = "MAX" if connection.vendor == "sqlite" else "GREATEST"
+    cases = []
+    params = []
+    for change in merged.values():
+        if change.target is not None:
+            cases.append("WHEN %s THEN %s")
+            params += [change.id, change.target]
+        else:
+            cases.append(f"WHEN %s THEN {greatest}({column} + %s, 0)")
+            params += [change.id, change.delta]
+    ids = list(merged)
+    sql = (
+        f"UPDATE {quote(Item._meta.db_table)} SET {column} = CASE {quote('id')} {' '.join(cases)} "
+        f"ELSE {column} END WHERE {quote('id')} IN ({', '.join(['%s'] * len(ids))}) "
+        f"RETURNING {', '.join(quote(name) for name in RETURNED_FIELDS)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + ids)
+        return cursor.fetchall()
+
+
+def _update_then_select(merged: Dict[int, QuantityChange], field: str) -> List[tuple]:
+    updated = Item.objects.filter(id__in=merged).update(
+        **{
+            field: Case(
+                *[When(id=item_id, then=change.expression(field)) for item_id, change in merged.items()],
+                default=F(field),
+                output_field=IntegerField(),
+            )
+        }
+    )
+    if not updated:
+        return []
+    return list(Item.objects.filter(id__in=merged).values_list(*RETURNED_FIELDS))
+
+
+def adjust(changes: Iterable[QuantityChange], field: str = "current_quantity") -> Tuple[List[dict], List[int]]:
+    """Apply relative or absolute changes to ``field`` and return the new values.
+
+    Returns one ``{id, current_quantity, desired_quantity, missing_quantity}``
+    dict per updated item, in request order, and the ids that do not exist.
+    """
+    if field not in QUANTITY_FIELDS:
+        raise ValueError(f"{field} is not a quantity field")
+    merged = merge(changes)
+    if not merged:
+        return [], []
+
+    with transaction.atomic():
+        if _can_update_returning():
+            rows = _update_returning(merged, field)
+        else:
+            rows = _update_then_select(merged, field)
+        if rows:
+            versioning.bump(versioning.ITEMS)
+
+    by_id = {row[0]: dict(zip(RETURNED_FIELDS, row)) for row in rows}
+    results = [by_id[item_id] for item_id in merged if item_id in by_id]
+    missing = [item_id for item_id in merged if item_id not in by_id]
+    return results, missing
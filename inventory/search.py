@@ -0,0 +1,231 @@
+"""Full-text search over item, tag and location names.
+
+On SQLite the names live in an FTS5 virtual table using the trigram tokenizer,
+which answers substring queries from an index instead of scanning every row
+with ``LIKE '%...%'``. Item documents also carry the names of their tags and
+locations so "dairy" finds the milk. The table is kept in sync by the signal
+handlers in ``inventory.signals``; on other databases, or before the migration
+has run, every function falls back to plain ``icontains`` lookups.
+"""
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SEARCH_TABLE = "inventory_search"
+KINDS = ("item", "tag", "location")
+
+# The trigram tokenizer cannot match terms shorter than three characters
+MIN_MATCH_LENGTH = 3
+
+# bm25 weights per column: kind, object_id, name, context
+RANK = f"bm25({SEARCH_TABLE}, 0.0, 0.0, 10.0, 1.0)"
+
+ITEM_DOCUMENT_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (kind, object_id, name, context)
+    SELECT 'item', i.id, i.name,
+           COALESCE((SELECT group_concat(t.name, ' ')
+                     FROM inventory_tag t
+                     JOIN inventory_item_tags it ON it.tag_id = t.id
+                     WHERE it.item_id = i.id), '')
+           || ' ' ||
+           COALESCE((SELECT group_concat(l.name, ' ')
+                     FROM inventory_location l
+                     JOIN inventory_item_locations il ON il.location_id = l.id
+                     WHERE il.item_id = i.id), '')
+    FROM inventory_item i
+"""
+
+_available = set()
+
+# Wildcards of LIKE patterns built from user input are escaped with this
+LIKE_ESCAPE = "\\"
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    id: int
+    name: str
+    score: float
+
+    def as_dict(self) -> dict:
+        return {"type": self.kind, "id": self.id, "name": self.name, "score": round(self.score, 4)}
+
+
+def is_available(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """Return True if the FTS index exists on this database."""
+    if using in _available:
+        return True
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+        found = cursor.fetchone() is not None
+    # Only cache success, the table may still be created by a later migrate
+    if found:
+        _available.add(using)
+    return found
+
+
+def _match_expression(query: str) -> str:
+    """Quote every whitespace-separated term so FTS5 syntax in user input is inert."""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def _use_match(query: str) -> bool:
+    return all(len(term) >= MIN_MATCH_LENGTH for term in query.split())
+
+
+def _placeholders(values: Sequence) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def index_names(kind: str, rows: Iterable[Tuple[int, str]], using: str = DEFAULT_DB_ALIAS) -> None:
+    """(Re)index tags or locations given as ``(id, name)`` pairs."""
+    rows = list(rows)
+    if not rows or not is_available(using):
+        return
+    ids = [pk for pk, _ in rows]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE kind = %s AND object_id IN ({_placeholders(ids)})",
+            [kind, *ids],
+        )
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (kind, object_id, name, context) VALUES (%s, %s, %s, '')",
+            [(kind, pk, name) for pk, name in rows],
+        )
+
+
+def reindex_items(item_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """Rebuild the documents of the given items from their current names, tags and locations."""
+    ids = list(set(item_ids))
+    if not ids or not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE kind = 'item' AND object_id IN ({_placeholders(ids)})",
+            ids,
+        )
+        cursor.execute(f"{ITEM_DOCUMENT_SQL} WHERE i.id IN ({_placeholders(ids)})", ids)
+
+
+def remove(kind: str, object_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    ids = list(object_ids)
+    if not ids or not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE kind = %s AND object_id IN ({_placeholders(ids)})",
+            [kind, *ids],
+        )
+
+
+def rebuild(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """Drop and refill the whole index. Returns False if FTS is not available."""
+    if not is_available(using):
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (kind, object_id, name, context) "
+            "SELECT 'tag', id, name, '' FROM inventory_tag"
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (kind, object_id, name, context) "
+            "SELECT 'location', id, name, '' FROM inventory_location"
+        )
+        cursor.execute(ITEM_DOCUMENT_SQL)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return True
+
+
+def item_ids_sql(query: str, using: str = DEFAULT_DB_ALIAS) -> Optional[Tuple[str, list]]:
+    """Return ``(sql, params)`` selecting the ids of items matching ``query``.
+
+    Meant to be used as ``id__in=RawSQL(*item_ids_sql(q))``. Returns None if
+    FTS is not available so the caller can fall back to ``icontains``.
+    """
+    query = query.strip()
+    if not query or not is_available(using):
+        return None
+    if _use_match(query):
+        return (
+            f"SELECT object_id FROM {SEARCH_TABLE} WHERE kind = 'item' AND {SEARCH_TABLE} MATCH %s",
+            [_match_expression(query)],
+        )
+    return (
+        f"SELECT object_id FROM {SEARCH_TABLE} WHERE kind = 'item' "
+        f"AND (name LIKE %s ESCAPE '{LIKE_ESCAPE}' OR context LIKE %s ESCAPE '{LIKE_ESCAPE}')",
+        [f"%{_escape_like(query)}%"] * 2,
+    )
+
+
+def search(
+    query: str,
+    kinds: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    using: str = DEFAULT_DB_ALIAS,
+) -> List[SearchHit]:
+    """Ranked search over item, tag and location names.
+
+    Exact and prefix matches on the name come first, the rest is ordered by
+    bm25 relevance (name matches weigh more than tag/location context).
+    """
+    query = query.strip()
+    kinds = [kind for kind in (kinds or KINDS) if kind in KINDS]
+    if not query or not kinds or limit <= 0:
+        return []
+    if not is_available(using):
+        return _search_fallback(query, kinds, limit)
+
+    kind_filter = f"kind IN ({_placeholders(kinds)})"
+    if _use_match(query):
+        where = f"{SEARCH_TABLE} MATCH %s AND {kind_filter}"
+        params = [_match_expression(query), *kinds]
+        rank = RANK
+    else:
+        where = f"(name LIKE %s ESCAPE '{LIKE_ESCAPE}' OR context LIKE %s ESCAPE '{LIKE_ESCAPE}') AND {kind_filter}"
+        params = [f"%{_escape_like(query)}%"] * 2 + kinds
+        rank = "0.0"
+
+    sql = f"""
+        SELECT kind, object_id, name, {rank} AS score
+        FROM {SEARCH_TABLE}
+        WHERE {where}
+        ORDER BY CASE WHEN lower(name) = lower(%s) THEN 0
+                      WHEN name LIKE %s ESCAPE '{LIKE_ESCAPE}' THEN 1
+                      ELSE 2 END,
+                 score, name
+        LIMIT %s
+    """
+    params += [query, f"{_escape_like(query)}%", limit]
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25 is lower-is-better; expose a higher-is-better score to clients
+        return [SearchHit(kind, int(pk), name, 0.0 - float(score)) for kind, pk, name, score in cursor.fetchall()]
+
+
+def _escape_like(value: str) -> str:
+    """``value`` with the LIKE wildcards and the escape character matched literally."""
+    for char in (LIKE_ESCAPE, "%", "_"):
+        value = value.replace(char, LIKE_ESCAPE + char)
+    return value
+
+
+def _search_fallback(query: str, kinds: Sequence[str], limit: int) -> List[SearchHit]:
+    from .models import Item, Location, Tag
+
+    models = {"item": Item, "tag": Tag, "location": Location}
+    hits: List[SearchHit] = []
+    for kind in kinds:
+        rows = models[kind].objects.filter(name__icontains=query).order_by("name").values_list("id", "name")[:limit]
+        for pk, name in rows:
+            lowered = name.lower()
+            score = 2.0 if lowered == query.lower() else 1.0 if lowered.startswith(query.lower()) else 0.0
+            hits.append(SearchHit(kind, pk, name, score))
+    hits.sort(key=lambda hit: (-hit.score, hit.name))
+    return hits[:limit]
@@ -0,0 +1,96 @@
+"""Rendering of the shopping list as PNG or WebP images.
+
+Long lists are split into fixed-size pages so no request allocates a canvas
+taller than ``LINES_PER_PAGE`` rows. The font is loaded once per process and
+encoded pages are cached under a hash of the list content, the language and
+the page, so an unchanged list is never drawn twice.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Sequence, Tuple
+
+from django.core.cache import cache
+from PIL import Image, ImageDraw, ImageFont, features
+
+WIDTH = 800
+LINE_HEIGHT = 40
+HEADER_HEIGHT = 80
+LINES_PER_PAGE = 50
+FONT_SIZE = 24
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# format parameter -> (Pillow format, content type, file extension)
+FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int = FONT_SIZE):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def is_supported(image_format: str) -> bool:
+    if image_format not in FORMATS:
+        return False
+    return image_format != "webp" or features.check("webp")
+
+
+def page_count(line_count: int) -> int:
+    return max(1, -(-line_count // LINES_PER_PAGE))
+
+
+def _draw_page(title: str, lines: Sequence[str], image_format: str) -> bytes:
+    height = HEADER_HEIGHT + LINE_HEIGHT * len(lines)
+    # Black text on white only needs one channel, a third of the RGB data to encode
+    image = Image.new("L", (WIDTH, height), color=255)
+    draw = ImageDraw.Draw(image)
+    font = get_font()
+
+    y = 20
+    draw.text((20, y), title, fill=0, font=font)
+    y += 40
+    for line in lines:
+        draw.text((20, y), line, fill=0, font=font)
+        y += LINE_HEIGHT
+
+    output = BytesIO()
+    if image_format == "webp":
+        image.save(output, format="WEBP", lossless=True, method=4)
+    else:
+        image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def render(
+    title: str,
+    lines: List[str],
+    language: str,
+    page: int = 1,
+    image_format: str = "png",
+) -> Tuple[bytes, int]:
+    """Return the encoded image of one page and the total number of pages.
+
+    ``page`` is 1-based and clamped to the available range.
+    """
+    pages = page_count(len(lines))
+    page = min(max(page, 1), pages)
+    if pages > 1:
+        title = f"{title} ({page}/{pages})"
+
+    digest = hashlib.sha256(
+        json.dumps([title, lines, language], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    key = f"shopping_image:{image_format}:{page}:{digest}"
+    content = cache.get(key)
+    if content is None:
+        start = (page - 1) * LINES_PER_PAGE
+        content = _draw_page(title, lines[start:start + LINES_PER_PAGE], image_format)
+        cache.set(key, content, CACHE_TIMEOUT)
+    return content, pages
@@ -0,0 +1,69 @@
+"""Signal handlers keeping the search index and version stamps in sync with the models."""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search, versioning
+from .models import Item, Location, Tag, UserSettings
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance: Item, raw: bool = False, **kwargs) -> None:
+    versioning.bump(versioning.ITEMS)
+    if not raw:
+        search.reindex_items([instance.pk])
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance: Item, **kwargs) -> None:
+    versioning.bump(versioning.ITEMS)
+    search.remove("item", [instance.pk])
+
+
+@receiver(m2m_changed, sender=Item.tags.through)
+@receiver(m2m_changed, sender=Item.locations.through)
+def reindex_item_relations(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    if reverse and action == "pre_clear":
+        # A reverse clear (tag.item_set.clear()) does not report the removed items
+        instance._search_item_ids = list(instance.item_set.values_list("id", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    versioning.bump(versioning.ITEMS)
+    if not reverse:
+        search.reindex_items([instance.pk])
+    elif action == "post_clear":
+        search.reindex_items(getattr(instance, "_search_item_ids", []))
+    elif pk_set:
+        search.reindex_items(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Location)
+def index_label(sender, instance, raw: bool = False, created: bool = False, **kwargs) -> None:
+    kind = "tag" if sender is Tag else "location"
+    versioning.bump(versioning.TAGS if sender is Tag else versioning.LOCATIONS)
+    if raw:
+        return
+    search.index_names(kind, [(instance.pk, instance.name)])
+    if not created:
+        # Items carry their tag and location names in their own documents
+        search.reindex_items(instance.item_set.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Location)
+def remember_labelled_items(sender, instance, **kwargs) -> None:
+    # The M2M rows are gone by post_delete, so collect the affected items now
+    instance._search_item_ids = list(instance.item_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Location)
+def unindex_label(sender, instance, **kwargs) -> None:
+    versioning.bump(versioning.TAGS if sender is Tag else versioning.LOCATIONS)
+    search.remove("tag" if sender is Tag else "location", [instance.pk])
+    search.reindex_items(getattr(instance, "_search_item_ids", []))
+
+
+@receiver(post_save, sender=UserSettings)
+def bump_settings(sender, instance: UserSettings, **kwargs) -> None:
+    versioning.bump(versioning.SETTINGS)
@@ -1,3 +1,526 @@
-from django.test import TestCase
+import asyncio
+import io
+import warnings
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.client import AsyncRequestFactory
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from . import classifier, exports, importer, quantities, search
+from .ai import ai, clients, jobs, offline, response_cache, streaming, structured
+from .listing import ListingParams, decode_cursor, encode_cursor, fetch_page
+from .models import AIJob, Item, Location, Tag
+
+
+class ListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(7):
+            Item.objects.create(name=f"Item {index}", desired_quantity=index % 3, current_quantity=0)
+
+    def collect(self, **query):
+        """Follow the cursors to the end and return every item name in order."""
+        names = []
+        cursor = None
+        while True:
+            params = ListingParams.from_query({**query, "limit": "3", **({"after": cursor} if cursor else {})})
+            page = fetch_page(params)
+            names.extend(item.name for item in page.items)
+            if not page.has_more:
+                return names
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_item_once(self):
+        self.assertEqual(self.collect(), sorted(Item.objects.values_list("name", flat=True)))
+
+    def test_pages_with_duplicate_sort_values(self):
+        expected = list(Item.objects.order_by("-missing_quantity", "-id").values_list("name", flat=True))
+        self.assertEqual(self.collect(sort="missing", dir="desc"), expected)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor("Milk", 5)), ("Milk", 5))
+        self.assertIsNone(decode_cursor("not a cursor"))
+
+    def test_cursor_of_another_type_is_ignored(self):
+        first = fetch_page(ListingParams.from_query({"sort": "missing", "limit": "3"}))
+        # ["a", 1] applied to an integer column
+        page = fetch_page(ListingParams.from_query({"sort": "missing", "limit": "3", "after": encode_cursor("a", 1)}))
+        self.assertEqual(page.items, first.items)
+        page = fetch_page(ListingParams.from_query({"sort": "name", "limit": "3", "after": encode_cursor(2, 1)}))
+        self.assertEqual(page.items[0].name, "Item 0")
+
+    def test_item_page_with_mismatched_cursor(self):
+        response = self.client.get(reverse("inventory:item_page"), {"sort": "missing", "after": "WyJhIiwxXQ"})
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.assertTrue(search.is_available())
+        self.dairy = Tag.objects.create(name="Dairy")
+        self.fridge = Location.objects.create(name="Fridge")
+        self.milk = Item.objects.create(name="Milk")
+        self.milk.tags.add(self.dairy)
+        self.milk.locations.add(self.fridge)
+        self.eggs = Item.objects.create(name="Eggs 10%")
+
+    def names(self, query, kinds=("item",)):
+        return [hit.name for hit in search.search(query, kinds)]
+
+    def test_substring_and_context_matches(self):
+        self.assertEqual(self.names("ilk"), ["Milk"])
+        self.assertEqual(self.names("dairy"), ["Milk"])
+        self.assertEqual(self.names("Fridge", ["location"]), ["Fridge"])
+
+    def test_like_wildcards_are_literal(self):
+        self.assertEqual(self.names("%"), ["Eggs 10%"])
+        self.assertEqual(self.names("_"), [])
+        self.assertEqual(self.names("\\"), [])
+        self.assertEqual(self.names("0%"), ["Eggs 10%"])
+
+    def test_listing_filter_escapes_wildcards(self):
+        page = fetch_page(ListingParams.from_query({"q": "_"}))
+        self.assertEqual(page.items, [])
+
+    def test_renamed_item_is_reindexed(self):
+        self.milk.name = "Oat drink"
+        self.milk.save()
+        self.assertEqual(self.names("milk"), [])
+        self.assertEqual(self.names("oat"), ["Oat drink"])
+
+    def test_deleted_item_is_removed(self):
+        self.milk.delete()
+        self.assertEqual(self.names("dairy"), [])
+
+    def test_relation_changes_reindex_items(self):
+        self.milk.tags.remove(self.dairy)
+        self.assertEqual(self.names("dairy"), [])
+        self.dairy.item_set.add(self.eggs)
+        self.assertEqual(self.names("dairy"), ["Eggs 10%"])
+        self.dairy.item_set.clear()
+        self.assertEqual(self.names("dairy"), [])
+
+    def test_renamed_and_deleted_labels_update_items(self):
+        self.fridge.name = "Freezer"
+        self.fridge.save()
+        self.assertEqual(self.names("freezer"), ["Milk"])
+        self.assertEqual(self.names("fridge"), [])
+        self.dairy.delete()
+        self.assertEqual(self.names("dairy"), [])
+        self.assertEqual(self.names("dairy", ["tag"]), [])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        fridge = Location.objects.create(name="Fridge")
+        milk = Item.objects.create(name="Milk", desired_quantity=3, current_quantity=1)
+        milk.locations.add(fridge)
+        Item.objects.create(name="Apples", desired_quantity=5, current_quantity=0)
+        Item.objects.create(name="Salt", desired_quantity=1, current_quantity=1)
+        self.url = reverse("inventory:shopping_list_export")
+
+    def test_formats_and_groups(self):
+        self.assertEqual(b"".join(self.client.get(self.url).streaming_content), b"Apples: 5\nMilk: 2\n")
+        response = self.client.get(self.url, {"format": "csv", "group": "location"})
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            ["name,missing,location", "Milk,2,Fridge", "Apples,5,"],
+        )
+        response = self.client.get(self.url, {"format": "jsonl"})
+        self.assertEqual(b"".join(response.streaming_content).count(b"\n"), 2)
+        self.assertEqual(self.client.get(self.url, {"format": "xml"}).status_code, 400)
+
+    async def test_asgi_streams_without_buffering(self):
+        with warnings.catch_warnings():
+            # Django warns when it has to read a sync iterator to the end first
+            warnings.simplefilter("error")
+            response = await self.async_client.get(self.url, {"format": "csv"})
+            self.assertTrue(response.is_async)
+            content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().splitlines(), ["name,missing", "Apples,5", "Milk,2"])
+
+    def test_aiter_lines_reads_in_chunks(self):
+        async def chunks():
+            return [chunk async for chunk in exports.aiter_lines(exports.stream_jsonl(), chunk_size=1)]
+
+        self.assertEqual(len(async_to_sync(chunks)()), 2)
+
+    def test_aiter_lines_closes_an_abandoned_export(self):
+        lines = exports.stream_jsonl()
+
+        async def first_chunk():
+            chunks = exports.aiter_lines(lines, chunk_size=1)
+            chunk = await anext(chunks)
+            await chunks.aclose()
+            return chunk
+
+        self.assertIn("Apples", async_to_sync(first_chunk)())
+        self.assertIsNone(lines.gi_frame)
+
+
+class ClassifierTests(SimpleTestCase):
+    def test_english_names_keep_their_classification(self):
+        # Czech stems such as "led", "nov" and "velk" occur inside English words
+        with translation.override("en"):
+            for name in ("Ledger", "Novelties", "Velkro"):
+                with self.subTest(name=name):
+                    self.assertEqual(classifier.classify("tag", name), classifier.DEFAULTS["tag"])
+                    self.assertEqual(classifier.classify("location", name), classifier.DEFAULTS["location"])
+            self.assertEqual(classifier.classify("tag", "Bulk"), ("#374151", "📦"))
+
+    def test_language_rules_apply_in_their_language(self):
+        self.assertEqual(classifier.classify("tag", "Led", language="cs"), ("#0ea5e9", "❄️"))
+        self.assertEqual(classifier.classify("tag", "Led", language="en"), classifier.DEFAULTS["tag"])
+        with translation.override("cs"):
+            self.assertEqual(classifier.classify("tag", "Mléko"), ("#3b82f6", "🥛"))
+            # The English rules apply in every language
+            self.assertEqual(classifier.classify("tag", "Milk"), ("#3b82f6", "🥛"))
+
+
+class NamedModelTests(TestCase):
+    def test_non_ascii_names_are_one_name_in_any_case(self):
+        tea = Tag.objects.create(name="Čaj")
+        self.assertEqual(Tag.objects.get_or_create_named("čaj"), (tea, False))
+        self.assertEqual(list(Tag.objects.named_any(["ČAJ"])), [tea])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Tag.objects.create(name="ČAJ")
+
+    def test_renaming_updates_the_key(self):
+        item = Item.objects.create(name="Milk")
+        item.name = "Šunka"
+        item.save(update_fields=["name"])
+        self.assertEqual(Item.objects.named("ŠUNKA").get(), item)
+        self.assertFalse(Item.objects.named("milk").exists())
+
+
+class ImporterTests(TestCase):
+    CSV = (
+        "name,desired_quantity,current_quantity,locations,tags\n"
+        "Milk,2,1,Fridge,\"Dairy, drinks\"\n"
+        "Butter,1,0,fridge,dairy\n"
+        ",1,1,,\n"
+        "Jam,-1,0,,\n"
+    )
+
+    def import_csv(self, text, **options):
+        return importer.import_file(io.StringIO(text), "csv", **options)
+
+    def test_creates_items_and_labels_ignoring_case(self):
+        result = self.import_csv(self.CSV)
+        self.assertEqual((result.created, result.skipped, result.tags_created, result.locations_created), (2, 2, 2, 1))
+        self.assertEqual(len(result.errors), 2)
+        butter = Item.objects.get(name="Butter")
+        self.assertEqual([tag.name for tag in butter.tags.all()], ["Dairy"])
+        self.assertEqual([location.name for location in butter.locations.all()], ["Fridge"])
+        self.assertEqual(Item.objects.get(name="Milk").tags.count(), 2)
+
+    def test_existing_items_are_skipped_or_updated(self):
+        Item.objects.create(name="milk", desired_quantity=5, current_quantity=5)
+        result = self.import_csv("name,current_quantity,tags\nMilk,1,Dairy\n")
+        self.assertEqual((result.created, result.skipped), (0, 1))
+        self.assertEqual(Item.objects.get(name="milk").current_quantity, 5)
+        result = self.import_csv("name,current_quantity,tags\nMilk,1,Dairy\nEggs,6,\n", update_existing=True)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        milk = Item.objects.get(name="milk")
+        self.assertEqual(milk.current_quantity, 1)
+        self.assertEqual([tag.name for tag in milk.tags.all()], ["Dairy"])
+
+    def test_names_match_the_database_ignoring_non_ascii_case(self):
+        Tag.objects.create(name="Čaj")
+        Item.objects.create(name="Šunka")
+        result = self.import_csv("name,tags\nŠUNKA,čaj\nŽampion,ČAJ\n", update_existing=True)
+        self.assertEqual((result.created, result.updated, result.tags_created), (1, 1, 0))
+        self.assertEqual(Tag.objects.get().item_set.count(), 2)
+        self.assertEqual(Item.objects.get(name="Žampion").name_key, "žampion")
+
+    def test_repeated_name_keeps_the_last_row(self):
+        result = self.import_csv("name,current_quantity\nMilk,1\nMILK,3\n")
+        self.assertEqual((result.created, result.skipped), (1, 1))
+        self.assertEqual(Item.objects.get().current_quantity, 3)
+
+    def test_jsonl_with_lists(self):
+        lines = '{"name": "Milk", "tags": ["Dairy"]}\n\n{"name": "Eggs", "locations": "Fridge, Pantry"}\n'
+        result = importer.import_file(io.StringIO(lines), "jsonl")
+        self.assertEqual((result.created, result.tags_created, result.locations_created), (2, 1, 2))
+        with self.assertRaises(importer.ImportFormatError):
+            importer.import_file(io.StringIO("[1]\n"), "jsonl")
+
+    def test_imported_items_are_searchable(self):
+        self.import_csv(self.CSV)
+        self.assertEqual([hit.name for hit in search.search("dairy", ["item"])], ["Butter", "Milk"])
+
+    def test_import_endpoint(self):
+        url = reverse("inventory:item_import")
+        response = self.client.post(url, {"file": SimpleUploadedFile("items.jsonl", b'{"name": "Milk"}\n')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
+        response = self.client.post(url, {"file": SimpleUploadedFile("items.jsonl", b"not json\n")})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"file": SimpleUploadedFile("items.xml", b""), "format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+class QuantityTests(TestCase):
+    def setUp(self):
+        self.milk = Item.objects.create(name="Milk", current_quantity=2, desired_quantity=3)
+        self.eggs = Item.objects.create(name="Eggs", current_quantity=10, desired_quantity=6)
+
+    def test_parse_change_applies_the_difference_the_client_saw(self):
+        change = quantities.parse_change({"id": self.milk.id, "suggested_new_quantity": 1, "current_quantity": 2})
+        self.assertEqual(change, quantities.QuantityChange(self.milk.id, delta=-1))
+        change = quantities.parse_change({"id": str(self.milk.id), "suggested_new_quantity": 4})
+        self.assertEqual(change, quantities.QuantityChange(self.milk.id, quantity=4))
+        for bad in ({"id": True}, {"suggested_new_quantity": 1}, {"id": 1, "suggested_new_quantity": -1}):
+            with self.subTest(change=bad), self.assertRaises(ValueError):
+                quantities.parse_change(bad)
+
+    def test_parse_adjustment(self):
+        self.assertEqual(quantities.parse_adjustment({"id": 1}).delta, 1)
+        self.assertEqual(quantities.parse_adjustment({"id": 1, "op": "decrement", "amount": 3}).delta, -3)
+        self.assertEqual(quantities.parse_adjustment({"id": 1, "op": "set", "amount": 0}).quantity, 0)
+        for bad in ({"id": 1, "op": "double"}, {"id": 1, "amount": -1}, {"op": "set"}):
+            with self.subTest(adjustment=bad), self.assertRaises(ValueError):
+                quantities.parse_adjustment(bad)
+
+    def test_merge_keeps_the_last_absolute_value(self):
+        QuantityChange = quantities.QuantityChange
+        merged = quantities.merge([QuantityChange(1, delta=2), QuantityChange(1, quantity=5), QuantityChange(1, delta=-1)])
+        self.assertEqual(merged[1].target, 4)
+
+    def test_apply_is_relative_to_the_database_and_clamped(self):
+        Item.objects.filter(id=self.milk.id).update(current_quantity=5)
+        results, missing = quantities.apply([
+            quantities.QuantityChange(self.milk.id, delta=-1),
+            quantities.QuantityChange(self.eggs.id, delta=-20),
+            quantities.QuantityChange(0, delta=1),
+        ])
+        self.assertEqual(missing, [0])
+        self.assertEqual(
+            [(row["name"], row["old_quantity"], row["new_quantity"]) for row in results],
+            [("Eggs", 10, 0), ("Milk", 5, 4)],
+        )
+
+    def check_adjust(self):
+        results, missing = quantities.adjust([
+            quantities.QuantityChange(self.eggs.id, delta=-12),
+            quantities.QuantityChange(self.milk.id, quantity=1),
+            quantities.QuantityChange(0, delta=1),
+        ])
+        self.assertEqual(missing, [0])
+        self.assertEqual(results, [
+            {"id": self.eggs.id, "current_quantity": 0, "desired_quantity": 6, "missing_quantity": 6},
+            {"id": self.milk.id, "current_quantity": 1, "desired_quantity": 3, "missing_quantity": 2},
+        ])
+        results, _ = quantities.adjust([quantities.QuantityChange(self.milk.id, delta=2)], field="desired_quantity")
+        self.assertEqual(results[0]["missing_quantity"], 4)
+        with self.assertRaises(ValueError):
+            quantities.adjust([], field="name")
+
+    def test_adjust_with_update_returning(self):
+        self.assertTrue(quantities._can_update_returning())
+        self.check_adjust()
+
+    def test_adjust_with_update_then_select(self):
+        with mock.patch.object(quantities, "_can_update_returning", return_value=False):
+            self.check_adjust()
+
+    def test_update_returning_is_not_assumed_from_insert_support(self):
+        with mock.patch.object(quantities, "connection") as connection:
+            connection.vendor = "mysql"
+            connection.features.can_return_columns_from_insert = True
+            self.assertFalse(quantities._can_update_returning())
+
+
+class OfflineParserTests(TestCase):
+    def setUp(self):
+        self.eggs = Item.objects.create(name="Eggs", current_quantity=20)
+        self.milk = Item.objects.create(name="Milk", current_quantity=3)
+
+    def test_simple_utterance_is_confident(self):
+        result = offline.parse("two eggs and a milk")
+        self.assertTrue(result.is_confident())
+        self.assertEqual(result.entries, [{"id": self.eggs.id, "consumed": 2}, {"id": self.milk.id, "consumed": 1}])
+        self.assertEqual(offline.parse("a dozen eggs").entries, [{"id": self.eggs.id, "consumed": 12}])
+        self.assertTrue(offline.parse("a dozen eggs").is_confident())
+
+    def test_all_uses_the_stock(self):
+        result = offline.parse("all the milk")
+        self.assertEqual(result.entries, [{"id": self.milk.id, "consumed": 3}])
+        self.assertTrue(result.is_confident())
+
+    def test_competing_numbers_are_not_confident(self):
+        self.assertFalse(offline.parse("one 2 three eggs").is_confident())
+
+    def test_more_than_in_stock_is_not_confident(self):
+        self.assertFalse(offline.parse("10000 eggs").is_confident())
+        self.assertFalse(offline.parse("two milks and two milks").is_confident())
+
+
+class ClientPoolTests(SimpleTestCase):
+    def test_wsgi_request_closes_its_clients(self):
+        opened = []
+
+        @clients.close_after_wsgi_request
+        async def view(request):
+            opened.append(clients.http_client())
+            return None
+
+        async_to_sync(view)(RequestFactory().get("/"))
+        self.assertTrue(opened[0].is_closed)
+
+    def test_asgi_request_keeps_the_pool(self):
+        @clients.close_after_wsgi_request
+        async def view(request):
+            return clients.http_client()
+
+        async def two_requests():
+            first = await view(AsyncRequestFactory().get("/"))
+            second = await view(AsyncRequestFactory().get("/"))
+            await clients.aclose()
+            return first, second
+
+        first, second = asyncio.run(two_requests())
+        self.assertIs(first, second)
+        self.assertTrue(first.is_closed)
+
+
+class StreamingTests(TestCase):
+    ANSWERS = [
+        'Sure: [{"id": 1, "consumed": 2}, {"id": 2, "consumed": 1}]',
+        '{"consumed": [{"id": 1, "consumed": 2}]}',
+        '{"consumed": []}',
+        '{"consumed": "x"}',
+    ]
+
+    def feed(self, text, size=4):
+        parser = streaming.ConsumedParser()
+        entries = []
+        for start in range(0, len(text), size):
+            entries += parser.feed(text[start:start + size])
+        return parser, entries
+
+    def test_entries_with_unusable_numbers_are_dropped(self):
+        for value in ("²", "½", "-1", "1.5", True, 1.5):
+            with self.subTest(value=value):
+                self.assertIsNone(structured.clean_entry({"id": value, "consumed": 1}))
+        self.assertEqual(structured.clean_entry({"id": " 7 ", "consumed": 2.0}), {"id": 7, "consumed": 2})
+        self.assertEqual(structured.validate([{"id": "²", "consumed": 1}, {"id": 1, "consumed": 1}]), [{"id": 1, "consumed": 1}])
+
+    def test_parser_agrees_with_parse_consumed(self):
+        for answer in self.ANSWERS:
+            with self.subTest(answer=answer):
+                parser, entries = self.feed(answer)
+                try:
+                    expected = structured.parse_consumed(answer)
+                except structured.InvalidResponse:
+                    self.assertFalse(parser.found)
+                else:
+                    self.assertTrue(parser.found)
+                    self.assertEqual([structured.clean_entry(entry) for entry in entries], expected)
+
+    def stream(self, answer, text="something odd happened"):
+        async def provider(prompt, system=""):
+            yield answer
+
+        async def collect():
+            return [event async for event in ai.stream_consumed(text)]
+
+        with mock.patch.dict(ai.STREAMING_PROVIDERS, {"ollama": provider}), \
+                mock.patch.dict("os.environ", {"MODEL_PROVIDER": "ollama"}):
+            # Database work goes back to this thread, inside the test transaction
+            return async_to_sync(collect)()
+
+    def setUp(self):
+        self.milk = Item.objects.create(name="Milk")
+        patcher = mock.patch.object(response_cache, "responses", response_cache.ResponseCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_answer_without_entries_is_an_error_and_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ai.SuggestionError):
+                self.stream('{"consumed": "x"}')
+        self.assertEqual(response_cache.responses.hits, 0)
+
+    def test_bare_list_is_streamed_and_cached(self):
+        events = self.stream(f'[{{"id": {self.milk.id}, "consumed": 2}}]')
+        self.assertEqual(events[0], ("suggestion", {"id": self.milk.id, "name": "Milk", "consumed": 2}))
+        self.assertEqual(events[-1], ("done", {"cache": "miss"}))
+        self.assertEqual(self.stream("unused")[-1], ("done", {"cache": "hit"}))
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.first = AIJob.objects.create(user_input="two eggs")
+        self.second = AIJob.objects.create(user_input="some milk")
+
+    def test_claim_takes_the_oldest_queued_job(self):
+        job = jobs.claim("a")
+        self.assertEqual((job.id, job.status, job.worker, job.attempts), (self.first.id, AIJob.RUNNING, "a", 1))
+        self.assertEqual(jobs.claim("b").id, self.second.id)
+        self.assertIsNone(jobs.claim("c"))
+
+    def test_release_requeues_without_counting_the_attempt(self):
+        jobs.claim("a")
+        jobs.claim("b")
+        AIJob.objects.filter(id=self.first.id).update(suggestions=[{"id": 1, "consumed": 1}])
+        self.assertEqual(jobs.release("a"), 1)
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.status, self.first.attempts, self.first.suggestions), (AIJob.QUEUED, 0, None))
+        self.assertEqual(AIJob.objects.get(id=self.second.id).status, AIJob.RUNNING)
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        jobs.claim("a")
+        jobs.claim("a")
+        AIJob.objects.filter(id=self.second.id).update(attempts=jobs.MAX_ATTEMPTS)
+        AIJob.objects.update(started_at=timezone.now() - jobs.stale_after() - timedelta(seconds=1))
+        self.assertEqual(jobs.requeue_stale(), 2)
+        self.assertEqual(AIJob.objects.get(id=self.first.id).status, AIJob.QUEUED)
+        second = AIJob.objects.get(id=self.second.id)
+        self.assertEqual((second.status, second.error_status), (AIJob.FAILED, 504))
+
+    def test_purge_deletes_old_finished_jobs(self):
+        old = timezone.now() - jobs.retention() - timedelta(seconds=1)
+        AIJob.objects.filter(id=self.first.id).update(status=AIJob.DONE, finished_at=old)
+        AIJob.objects.filter(id=self.second.id).update(started_at=old)
+        self.assertEqual(jobs.purge(), 1)
+        self.assertEqual(list(AIJob.objects.values_list("id", flat=True)), [self.second.id])
+
+    def run_job(self, *events, error=None):
+        async def stream_consumed(user_input, language="en"):
+            for event in events:
+                yield event
+            if error:
+                raise error
+
+        job = jobs.claim("a")
+        with mock.patch.object(ai, "stream_consumed", stream_consumed):
+            async_to_sync(jobs.run)(job)
+        return AIJob.objects.get(id=job.id)
+
+    def test_run_stores_suggestions_and_outcome(self):
+        suggestion = {"id": 1, "name": "Eggs", "consumed": 2}
+        job = self.run_job(("suggestion", suggestion), ("done", {"cache": "miss"}))
+        self.assertEqual((job.status, job.suggestions, job.source), (AIJob.DONE, [suggestion], "miss"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_records_failures(self):
+        job = self.run_job(error=ai.SuggestionError("AI failed to provide valid response", 502))
+        self.assertEqual((job.status, job.error_status), (AIJob.FAILED, 502))
+
+    def test_run_leaves_a_job_taken_over_by_another_worker(self):
+        async def stream_consumed(user_input, language="en"):
+            await sync_to_async(AIJob.objects.filter(id=job.id).update)(worker="b")
+            yield "done", {"cache": "miss"}
+
+        job = jobs.claim("a")
+        with mock.patch.object(ai, "stream_consumed", stream_consumed):
+            async_to_sync(jobs.run)(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (AIJob.RUNNING, "b"))
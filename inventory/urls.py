@@ -8,11 +8,16 @@ app_name = "inventory"
 urlpatterns = [
     path("", views.index, name="index"),
     path("items/new/", views.item_create, name="item_create"),
+    path("items/page/", views.item_page, name="item_page"),
+    path("items/import/", views.item_import, name="item_import"),
+    path("items/adjust/", views.item_adjust, name="item_adjust"),
+    path("items/compact/", views.item_list_compact, name="item_list_compact"),
     path("items/<int:item_id>/edit/", views.item_edit, name="item_edit"),
     path("items/<int:item_id>/delete/", views.item_delete, name="item_delete"),
     path("items/<int:item_id>/update-field/", views.item_update_field, name="item_update_field"),
     path("shopping-list.txt", views.generate_shopping_list_text, name="shopping_list_text"),
     path("shopping-list.png", views.generate_shopping_list_image, name="shopping_list_image"),
+    path("shopping-list/export/", views.shopping_list_export, name="shopping_list_export"),
     path("settings/", views.settings, name="settings"),
     path("settings/defaults/", views.update_defaults, name="update_defaults"),
     path("tags/new/", views.tag_create, name="tag_create"),
@@ -25,13 +30,19 @@ urlpatterns = [
     # API endpoints
     path("api/autocomplete/tags/", views.autocomplete_tags, name="autocomplete_tags"),
     path("api/autocomplete/locations/", views.autocomplete_locations, name="autocomplete_locations"),
+    path("api/search/", views.search_api, name="search"),
     
     # Action views
     path("consume/", views.consume_view, name="consume"),
+    path("consume/jobs/", views.consume_job_submit, name="consume_job_submit"),
+    path("consume/jobs/<uuid:job_id>/", views.consume_job_status, name="consume_job_status"),
+    path("consume/jobs/<uuid:job_id>/events/", views.consume_job_events, name="consume_job_events"),
+    path("consume/jobs/<uuid:job_id>/result/", views.consume_job_result, name="consume_job_result"),
     path("consume/apply/", views.apply_consume_changes, name="apply_consume_changes"),
     
     # AI
     path("ai/get-consumed-suggestions/", ai.get_consumed_suggestions, name="get_consumed_suggestions"),
+    path("ai/cache-stats/", ai.ai_cache_stats, name="ai_cache_stats"),
 ]
 
 
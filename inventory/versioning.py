@@ -0,0 +1,55 @@
+"""Version stamps used to invalidate caches when inventory data changes.
+
+Every write to a scope bumps that scope and the inventory-wide stamp in a
+single UPDATE. The counters live in the database, so all workers see the same
+versions and a rolled-back write never leaves a bumped stamp behind.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChangeStamp
+
+ITEMS = "items"
+TAGS = "tags"
+LOCATIONS = "locations"
+SETTINGS = "settings"
+# Bumped together with every other scope
+INVENTORY = "inventory"
+
+SCOPES = (ITEMS, TAGS, LOCATIONS, SETTINGS, INVENTORY)
+
+
+def bump(*scopes: str) -> None:
+    """Increment the given scopes and the inventory-wide stamp."""
+    targets = {*scopes, INVENTORY}
+    updated = ChangeStamp.objects.filter(scope__in=targets).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    if updated < len(targets):
+        # Rows are seeded by migration; create any that went missing
+        existing = set(ChangeStamp.objects.filter(scope__in=targets).values_list("scope", flat=True))
+        ChangeStamp.objects.bulk_create(
+            [ChangeStamp(scope=scope, version=1) for scope in targets - existing],
+            ignore_conflicts=True,
+        )
+
+
+def get(scope: str) -> int:
+    """Return the current version of ``scope`` (0 if it was never bumped)."""
+    version = ChangeStamp.objects.filter(scope=scope).values_list("version", flat=True).first()
+    return version or 0
+
+
+def get_stamp(scope: str) -> Tuple[int, Optional[datetime]]:
+    """Return ``(version, updated_at)`` of ``scope`` in one lookup."""
+    row = ChangeStamp.objects.filter(scope=scope).values_list("version", "updated_at").first()
+    return row or (0, None)
+
+
+def get_many(scopes: Iterable[str]) -> Dict[str, int]:
+    scopes = list(scopes)
+    versions = dict(ChangeStamp.objects.filter(scope__in=scopes).values_list("scope", "version"))
+    return {scope: versions.get(scope, 0) for scope in scopes}
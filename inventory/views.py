@@ -1,17 +1,21 @@
-from io import BytesIO
+import asyncio
 import os
 from typing import List
 import json
 
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import QuerySet
-from django.http import FileResponse, HttpRequest, HttpResponse, JsonResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils.translation import gettext as _
+from django.utils.translation import get_language, gettext as _
 from django.views.decorators.http import require_POST
 import json
 import requests
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
@@ -19,12 +23,48 @@ from django.db.models import Q
 
 
 from inventory.ai.ai import *
-from .models import Item, Location, Tag, UserSettings
+from inventory.ai.ai import SuggestionError, suggest_consumed
+from inventory.ai import clients, jobs
+from . import autocomplete, exports, importer, quantities, search, shopping_image, versioning
+from .caching import conditional_on, page_cache_timeout, set_row_keys, versioned_page
+from .listing import ListingParams, fetch_page
+from .models import AIJob, Item, Location, Tag, UserSettings
 
 
+@conditional_on(versioning.INVENTORY)
+@versioned_page
 def index(request: HttpRequest) -> HttpResponse:
-    items: QuerySet[Item] = Item.objects.prefetch_related("locations", "tags").order_by("name")
-    return render(request, "inventory/index.html", {"items": items})
+    params = ListingParams.from_query(request.GET)
+    page = fetch_page(params)
+    set_row_keys(page.items)
+    return render(request, "inventory/index.html", {
+        "page": page,
+        "params": params,
+        "row_cache_timeout": page_cache_timeout(),
+        "total_count": Item.objects.count(),
+        "tags": Tag.objects.order_by("name").only("id", "name", "emoji"),
+        "locations": Location.objects.order_by("name").only("id", "name", "emoji"),
+    })
+
+
+@conditional_on(versioning.INVENTORY)
+@versioned_page
+def item_page(request: HttpRequest) -> JsonResponse:
+    """Return the next slice of the item listing as rendered table rows."""
+    params = ListingParams.from_query(request.GET)
+    page = fetch_page(params)
+    set_row_keys(page.items)
+    html = render_to_string(
+        "inventory/item_rows.html",
+        {"items": page.items, "row_cache_timeout": page_cache_timeout()},
+        request=request,
+    )
+    return JsonResponse({
+        "html": html,
+        "count": len(page.items),
+        "next_cursor": page.next_cursor,
+        "has_more": page.has_more,
+    })
 
 
 def item_create(request: HttpRequest) -> HttpResponse:
@@ -37,7 +77,7 @@ def item_create(request: HttpRequest) -> HttpResponse:
 
         if name:
             # Check for existing item
-            existing_item = Item.objects.filter(name=name).first()
+            existing_item = Item.objects.named(name).first()
             if existing_item:
                 return render(
                     request,
@@ -68,14 +108,14 @@ def item_create(request: HttpRequest) -> HttpResponse:
             
             locations = []
             for name_loc in location_names:
-                loc, created = Location.objects.get_or_create(name=name_loc)
+                loc, created = Location.objects.get_or_create_named(name_loc)
                 locations.append(loc)
                 if created:
                     new_locations.append(name_loc)
             
             tags = []
             for name_tag in tag_names:
-                tag, created = Tag.objects.get_or_create(name=name_tag)
+                tag, created = Tag.objects.get_or_create_named(name_tag)
                 tags.append(tag)
                 if created:
                     new_tags.append(name_tag)
@@ -125,7 +165,7 @@ def item_edit(request: HttpRequest, item_id: int) -> HttpResponse:
             )
         
         # Check for duplicate names (excluding current item)
-        existing_item = Item.objects.filter(name=name).exclude(id=item.id).first()
+        existing_item = Item.objects.named(name).exclude(id=item.id).first()
         if existing_item:
             return render(
                 request,
@@ -157,14 +197,14 @@ def item_edit(request: HttpRequest, item_id: int) -> HttpResponse:
         
         locations = []
         for name_loc in location_names:
-            loc, created = Location.objects.get_or_create(name=name_loc)
+            loc, created = Location.objects.get_or_create_named(name_loc)
             locations.append(loc)
             if created:
                 new_locations.append(name_loc)
         
         tags = []
         for name_tag in tag_names:
-            tag, created = Tag.objects.get_or_create(name=name_tag)
+            tag, created = Tag.objects.get_or_create_named(name_tag)
             tags.append(tag)
             if created:
                 new_tags.append(name_tag)
@@ -191,54 +231,94 @@ def item_delete(request: HttpRequest, item_id: int) -> HttpResponse:
     return render(request, "inventory/item_delete_confirm.html", {"item": item})
 
 
+@require_POST
+def item_import(request: HttpRequest) -> JsonResponse:
+    """Bulk import items from an uploaded CSV or JSON Lines ``file``.
+
+    ``format`` overrides the format detected from the file name and a truthy
+    ``update`` updates existing items instead of skipping them.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': _('Please choose a file to import')}, status=400)
+
+    file_format = request.POST.get('format') or importer.detect_format(upload.name)
+    if file_format not in importer.FORMATS:
+        return JsonResponse({'error': _('Unsupported import format')}, status=400)
+    update_existing = request.POST.get('update', '').lower() in ('1', 'true', 'on', 'yes')
+
+    try:
+        result = importer.import_file(importer.text_stream(upload), file_format, update_existing=update_existing)
+    except importer.ImportFormatError as e:
+        return JsonResponse({'error': _('The file could not be read: %(reason)s') % {'reason': e}}, status=400)
+    return JsonResponse(result.as_dict())
+
+
+@conditional_on(versioning.ITEMS)
 def generate_shopping_list_text(request: HttpRequest) -> HttpResponse:
-    lines: List[str] = []
-    for item in Item.objects.order_by("name"):
-        missing = item.missing_quantity
-        if missing > 0:
-            lines.append(f"{item.name}: {missing}")
+    lines: List[str] = [f"{name}: {missing}" for name, missing in _shopping_list_rows()]
     content = "\n".join(lines) or _("All stocked!")
     response = HttpResponse(content, content_type="text/plain")
     response["Content-Disposition"] = 'attachment; filename="shopping_list.txt"'
     return response
 
 
-def generate_shopping_list_image(request: HttpRequest) -> HttpResponse:
-    from PIL import Image, ImageDraw, ImageFont
+def _shopping_list_rows():
+    """Names and missing quantities of the items to buy, straight from the partial index."""
+    return (
+        Item.objects.filter(missing_quantity__gt=0)
+        .order_by("name")
+        .values_list("name", "missing_quantity")
+    )
 
-    items = [
-        (item.name, item.missing_quantity)
-        for item in Item.objects.order_by("name")
-        if item.missing_quantity > 0
-    ]
 
-    if not items:
-        items = [("All stocked!", 0)]
+@conditional_on(versioning.INVENTORY)
+def shopping_list_export(request: HttpRequest) -> HttpResponse:
+    """Stream the shopping list as txt, csv or jsonl, optionally grouped by location or tag."""
+    export_format = request.GET.get('format', 'txt')
+    group = request.GET.get('group') or None
+    if export_format not in exports.FORMATS:
+        return JsonResponse({'error': _('Unsupported export format')}, status=400)
+    if group is not None and group not in exports.GROUPS:
+        return JsonResponse({'error': _('Unsupported grouping')}, status=400)
+    
+    content_type, extension = exports.FORMATS[export_format]
+    content = exports.STREAMERS[export_format](group)
+    if isinstance(request, ASGIRequest):
+        content = exports.aiter_lines(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="shopping_list.{extension}"'
+    return response
+
 
-    width = 800
-    line_height = 40
-    height = 80 + line_height * len(items)
-    image = Image.new("RGB", (width, height), color=(255, 255, 255))
-    draw = ImageDraw.Draw(image)
+@conditional_on(versioning.ITEMS)
+def generate_shopping_list_image(request: HttpRequest) -> HttpResponse:
+    """Render the shopping list as an image, one page of rows per request.
+
+    Query parameters: ``page`` (1-based) and ``format`` (``png`` or ``webp``).
+    The number of pages is returned in the ``X-Page-Count`` header.
+    """
+    image_format = request.GET.get("format", "png")
+    if not shopping_image.is_supported(image_format):
+        return JsonResponse({'error': _('Unsupported image format')}, status=400)
     try:
-        font = ImageFont.truetype("DejaVuSans.ttf", 24)
-    except Exception:
-        font = ImageFont.load_default()
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
 
-    y = 20
-    draw.text((20, y), _("Shopping List"), fill=(0, 0, 0), font=font)
-    y += 40
-    for name, missing in items:
-        line = name if missing == 0 else f"{name}: {missing}"
-        draw.text((20, y), line, fill=(0, 0, 0), font=font)
-        y += line_height
+    lines = [f"{name}: {missing}" for name, missing in _shopping_list_rows()] or [_("All stocked!")]
+    content, page_count = shopping_image.render(
+        _("Shopping List"), lines, get_language(), page=page, image_format=image_format
+    )
 
-    output = BytesIO()
-    image.save(output, format="PNG")
-    output.seek(0)
-    return FileResponse(output, filename="shopping_list.png", content_type="image/png")
+    _pil_format, content_type, extension = shopping_image.FORMATS[image_format]
+    response = HttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'inline; filename="shopping_list.{extension}"'
+    response["X-Page-Count"] = str(page_count)
+    return response
 
 
+@versioned_page
 def settings(request: HttpRequest) -> HttpResponse:
     """Settings page with tag and location management."""
     tags = Tag.objects.order_by("name").all()
@@ -256,7 +336,7 @@ def tag_create(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         name = request.POST.get("name", "").strip()
         if name:
-            Tag.objects.get_or_create(name=name)
+            Tag.objects.get_or_create_named(name)
         return redirect("inventory:settings")
     return redirect("inventory:settings")
 
@@ -269,8 +349,8 @@ def tag_edit(request: HttpRequest, tag_id: int) -> HttpResponse:
         color = request.POST.get("color", "").strip()
         emoji = request.POST.get("emoji", "").strip()
         
-        # Update name if provided and different
-        if name and name != tag.name:
+        # Update name if provided, different and not taken by another tag
+        if name and name != tag.name and not Tag.objects.named(name).exclude(id=tag.id).exists():
             tag.name = name
         
         # Update color if provided and valid
@@ -300,7 +380,7 @@ def location_create(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         name = request.POST.get("name", "").strip()
         if name:
-            Location.objects.get_or_create(name=name)
+            Location.objects.get_or_create_named(name)
         return redirect("inventory:settings")
     return redirect("inventory:settings")
 
@@ -313,8 +393,8 @@ def location_edit(request: HttpRequest, location_id: int) -> HttpResponse:
         color = request.POST.get("color", "").strip()
         emoji = request.POST.get("emoji", "").strip()
         
-        # Update name if provided and different
-        if name and name != location.name:
+        # Update name if provided, different and not taken by another location
+        if name and name != location.name and not Location.objects.named(name).exclude(id=location.id).exists():
             location.name = name
         
         # Update color if provided and valid
@@ -342,7 +422,7 @@ def location_delete(request: HttpRequest, location_id: int) -> HttpResponse:
 def update_defaults(request: HttpRequest) -> HttpResponse:
     """Update default colors and emojis for tags and locations."""
     if request.method == "POST":
-        settings = UserSettings.get_settings()
+        settings = UserSettings.load()
         
         # Update tag defaults
         tag_color = request.POST.get("default_tag_color", "").strip()
@@ -371,9 +451,8 @@ def update_defaults(request: HttpRequest) -> HttpResponse:
 
 @require_POST
 def item_update_field(request: HttpRequest, item_id: int) -> JsonResponse:
-    """Update a single field of an item via AJAX."""
+    """Update a single field of an item via AJAX, writing only that column."""
     try:
-        item = get_object_or_404(Item, id=item_id)
         field = request.POST.get('field', '').strip()
         value = request.POST.get('value', '').strip()
         
@@ -393,16 +472,21 @@ def item_update_field(request: HttpRequest, item_id: int) -> JsonResponse:
                     'error': _('Name cannot be empty')
                 })
             
+            item = get_object_or_404(Item.objects.only('id', 'name', 'missing_quantity'), id=item_id)
+            
             # Check for duplicate names
-            if Item.objects.filter(name=value).exclude(id=item.id).exists():
+            if Item.objects.named(value).exclude(id=item.id).exists():
                 return JsonResponse({
                     'success': False,
                     'error': _('An item with this name already exists')
                 })
             
             item.name = value
+            missing_quantity = item.missing_quantity
+            # save() keeps the signals that refresh the search index
+            item.save(update_fields=['name'])
             
-        elif field in ['desired_quantity', 'current_quantity']:
+        else:
             try:
                 numeric_value = int(value)
                 if numeric_value < 0:
@@ -410,20 +494,21 @@ def item_update_field(request: HttpRequest, item_id: int) -> JsonResponse:
                         'success': False,
                         'error': _('Quantity cannot be negative')
                     })
-                setattr(item, field, numeric_value)
             except ValueError:
                 return JsonResponse({
                     'success': False,
                     'error': _('Please enter a valid number')
                 })
-        
-        # Save the item
-        item.save()
+            
+            results, _missing = quantities.adjust([quantities.QuantityChange(item_id, quantity=numeric_value)], field=field)
+            if not results:
+                raise Http404
+            missing_quantity = results[0]['missing_quantity']
         
         return JsonResponse({
             'success': True,
             'message': _('Item updated successfully'),
-            'missing_quantity': item.missing_quantity  # Include updated missing quantity
+            'missing_quantity': missing_quantity  # Include updated missing quantity
         })
         
     except Exception as e:
@@ -433,62 +518,143 @@ def item_update_field(request: HttpRequest, item_id: int) -> JsonResponse:
         })
 
 
+@require_POST
+def item_adjust(request: HttpRequest) -> JsonResponse:
+    """Increment, decrement or set quantities of one or more items.
+
+    Takes ``{"adjustments": [{"id": 1, "op": "decrement", "amount": 1}, ...]}``
+    (``op`` is increment, decrement or set, ``amount`` defaults to 1) and an
+    optional ``field`` of ``current_quantity`` (default) or
+    ``desired_quantity``. The whole batch is one UPDATE that never goes below
+    zero; the response carries the resulting quantities of every item.
+    """
+    try:
+        data = json.loads(request.body)
+        adjustments = data.get('adjustments', [])
+        field = data.get('field', 'current_quantity')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': _('Invalid request format')}, status=400)
+    
+    if field not in quantities.QUANTITY_FIELDS:
+        return JsonResponse({'error': _('Invalid field name')}, status=400)
+    if not isinstance(adjustments, list) or not adjustments:
+        return JsonResponse({'error': _('No changes to apply')}, status=400)
+    
+    try:
+        changes = [quantities.parse_adjustment(adjustment) for adjustment in adjustments]
+    except (AttributeError, ValueError, TypeError):
+        return JsonResponse({'error': _('Invalid request format')}, status=400)
+    
+    items, missing = quantities.adjust(changes, field=field)
+    return JsonResponse({'success': True, 'items': items, 'not_found': missing})
+
+
+@conditional_on(versioning.TAGS)
 def autocomplete_tags(request: HttpRequest) -> JsonResponse:
-    """API endpoint for tag autocomplete."""
+    """API endpoint for tag autocomplete, answered from the in-process prefix index."""
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'results': []})
     
-    # Search for existing tags that match the query
-    tags = Tag.objects.filter(
-        name__icontains=query
-    ).order_by('name')[:10]  # Limit to 10 results
-    
-    results = []
-    for tag in tags:
-        results.append({
-            'id': tag.id,
-            'name': tag.name,
-            'emoji': tag.emoji,
-            'color': tag.color,
-            'type': 'existing'
-        })
-    
-    return JsonResponse({'results': results})
+    return JsonResponse({'results': autocomplete.suggest('tag', query)})
 
 
+@conditional_on(versioning.LOCATIONS)
 def autocomplete_locations(request: HttpRequest) -> JsonResponse:
-    """API endpoint for location autocomplete."""
+    """API endpoint for location autocomplete, answered from the in-process prefix index."""
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'results': []})
     
-    # Search for existing locations that match the query
-    locations = Location.objects.filter(
-        name__icontains=query
-    ).order_by('name')[:10]  # Limit to 10 results
+    return JsonResponse({'results': autocomplete.suggest('location', query)})
+
+
+def search_api(request: HttpRequest) -> JsonResponse:
+    """Ranked search over item, tag and location names.
+
+    Optional ``type`` restricts the results to a comma-separated list of
+    ``item``, ``tag`` and ``location``.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
     
-    results = []
-    for location in locations:
-        results.append({
-            'id': location.id,
-            'name': location.name,
-            'emoji': location.emoji,
-            'color': location.color,
-            'type': 'existing'
-        })
+    kinds = [k.strip() for k in request.GET.get('type', '').split(',') if k.strip()] or None
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
     
-    return JsonResponse({'results': results})
+    hits = search.search(query, kinds=kinds, limit=limit)
+    return JsonResponse({'results': [hit.as_dict() for hit in hits]})
+
+
+def _enhance_suggestion(item: Item, consumed: int) -> dict:
+    return {
+        'id': item.id,
+        'name': item.name,
+        'current_quantity': item.current_quantity,
+        'consumed_quantity': consumed,
+        'suggested_new_quantity': max(0, item.current_quantity - consumed),
+        'locations': [{'name': loc.name, 'emoji': loc.emoji, 'color': loc.color} for loc in item.locations.all()],
+        'tags': [{'name': tag.name, 'emoji': tag.emoji, 'color': tag.color} for tag in item.tags.all()]
+    }
+
+
+def _enhance_suggestions(suggestions: List[dict]) -> List[dict]:
+    """Add the current inventory data to the AI suggestions, in their order.
+
+    One query for the items and one per relation, however many suggestions
+    there are; suggestions for items that no longer exist are dropped.
+    """
+    items = Item.objects.prefetch_related('tags', 'locations').in_bulk(
+        [suggestion['id'] for suggestion in suggestions]
+    )
+    return [
+        _enhance_suggestion(items[suggestion['id']], suggestion['consumed'])
+        for suggestion in suggestions
+        if suggestion['id'] in items
+    ]
+
+
+COMPACT_ITEM_FIELDS = ('id', 'name', 'current_quantity')
+
+
+def _compact_items() -> List[tuple]:
+    """``(id, name, current_quantity)`` of every item by name, cached under the item version."""
+    key = f"items:compact:{versioning.get(versioning.ITEMS)}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Item.objects.order_by('name').values_list(*COMPACT_ITEM_FIELDS))
+        cache.set(key, rows, page_cache_timeout())
+    return rows
+
 
+@conditional_on(versioning.ITEMS)
+def item_list_compact(request: HttpRequest) -> JsonResponse:
+    """Every item as ``[id, name, current_quantity]`` for searching on the client.
 
-def consume_view(request: HttpRequest) -> HttpResponse:
-    """View for the consume form where users can input what they consumed."""
+    The consume page loads this once instead of receiving the whole
+    inventory with every analysis; unchanged lists are answered with 304.
+    """
+    return JsonResponse({'fields': COMPACT_ITEM_FIELDS, 'items': _compact_items()})
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@clients.close_after_wsgi_request
+async def consume_view(request: HttpRequest) -> HttpResponse:
+    """View for the consume form where users can input what they consumed.
+
+    Async so that waiting for the model does not occupy a worker thread.
+    """
     
     if request.method == "POST":
         # Handle AJAX form submission
         if request.content_type == 'application/json':
             try:
-                import json
                 data = json.loads(request.body)
                 user_input = data.get('userInput', '').strip()
                 language = data.get('language', 'en')
@@ -498,110 +664,183 @@ def consume_view(request: HttpRequest) -> HttpResponse:
                 if not user_input:
                     return JsonResponse({'error': _('Please enter what you consumed')}, status=400)
                 
-                # Get AI suggestions
-                ai_response = get_consumed_suggestions(request)
-                
-                # If AI response is successful, enhance it with current inventory data
-                if hasattr(ai_response, 'content'):
-                    import json
-                    try:
-                        ai_data = json.loads(ai_response.content.decode('utf-8'))
-                        if 'suggestions' in ai_data:
-                            # Enhance suggestions with current inventory data
-                            enhanced_suggestions = []
-                            for suggestion in ai_data['suggestions']:
-                                try:
-                                    # Find the item in inventory
-                                    item = Item.objects.get(id=suggestion['id'])
-                                    enhanced_suggestion = {
-                                        'id': item.id,
-                                        'name': item.name,
-                                        'current_quantity': item.current_quantity,
-                                        'consumed_quantity': suggestion['consumed'],
-                                        'suggested_new_quantity': max(0, item.current_quantity - suggestion['consumed']),
-                                        'locations': [{'name': loc.name, 'emoji': loc.emoji, 'color': loc.color} for loc in item.locations.all()],
-                                        'tags': [{'name': tag.name, 'emoji': tag.emoji, 'color': tag.color} for tag in item.tags.all()]
-                                    }
-                                    enhanced_suggestions.append(enhanced_suggestion)
-                                except Item.DoesNotExist:
-                                    continue
-                            
-                            # Return enhanced data
-                            return JsonResponse({
-                                'success': True,
-                                'suggestions': enhanced_suggestions,
-                                'all_items': [
-                                    {
-                                        'id': item.id,
-                                        'name': item.name,
-                                        'current_quantity': item.current_quantity
-                                    } for item in Item.objects.all().order_by('name')
-                                ]
-                            })
-                    except (json.JSONDecodeError, KeyError):
-                        pass
-                
-                return ai_response
+                # Get AI suggestions and enhance them with current inventory data
+                suggestions, cache_status = await suggest_consumed(user_input, language)
+                response = JsonResponse({
+                    'success': True,
+                    'suggestions': await sync_to_async(_enhance_suggestions)(suggestions),
+                })
+                response['X-AI-Cache'] = cache_status
+                return response
                 
             except json.JSONDecodeError:
                 return JsonResponse({'error': _('Invalid request format')}, status=400)
+            except SuggestionError as e:
+                return JsonResponse({'error': e.message}, status=e.status)
             except Exception as e:
                 return JsonResponse({'error': str(e)}, status=500)
     
     # Show the consume form
-    return render(request, "inventory/consume.html")
+    return await sync_to_async(render)(request, "inventory/consume.html")
+
+
+def _job_status(job: AIJob) -> dict:
+    data = {'id': str(job.id), 'status': job.status}
+    if job.status == AIJob.DONE:
+        data['result_url'] = reverse('inventory:consume_job_result', args=[job.id])
+    elif job.status == AIJob.FAILED:
+        data['error'] = job.error
+    return data
+
+
+@require_POST
+async def consume_job_submit(request: HttpRequest) -> JsonResponse:
+    """Queue an analysis for ``run_ai_worker`` and answer at once with its status.
+
+    Answers with 202, or with 200 and a ``result_url`` when the input needed
+    no model. The job can be polled at ``status_url`` or followed at
+    ``events_url``.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': _('Invalid request format')}, status=400)
+    user_input = str(data.get('userInput', '')).strip()
+    if not user_input:
+        return JsonResponse({'error': _('Please enter what you consumed')}, status=400)
+
+    job = await jobs.submit(user_input, data.get('language', 'en'))
+    response = JsonResponse(
+        {
+            **_job_status(job),
+            'status_url': reverse('inventory:consume_job_status', args=[job.id]),
+            'events_url': reverse('inventory:consume_job_events', args=[job.id]),
+        },
+        status=200 if job.is_finished else 202,
+    )
+    if job.source:
+        response['X-AI-Cache'] = job.source
+    return response
+
+
+# Seconds between looks at a followed job, and between keep-alive comments
+JOB_EVENTS_INTERVAL = 0.25
+JOB_EVENTS_KEEPALIVE = 15
+
+
+async def consume_job_events(request: HttpRequest, job_id) -> HttpResponse:
+    """Follow a queued analysis as server-sent events.
+
+    Each ``suggestion`` event carries one enhanced row as soon as the worker
+    has stored it, followed by ``done`` or by ``error`` with an ``error``
+    message. ``?after=N`` skips the first N suggestions so a
+    client can reconnect where it left off. The view only reads the job row;
+    the model runs in ``run_ai_worker``.
+    """
+    jobs_qs = AIJob.objects.filter(id=job_id).only('id', 'status', 'suggestions', 'source', 'error')
+    if not await jobs_qs.aexists():
+        return JsonResponse({'error': _('Analysis not found')}, status=404)
+    try:
+        sent = max(int(request.GET.get('after', 0)), 0)
+    except ValueError:
+        sent = 0
+
+    async def events():
+        nonlocal sent
+        quiet = 0.0
+        while True:
+            job = await jobs_qs.afirst()
+            if job is None:
+                yield _sse('error', {'error': _('Analysis not found')})
+                return
+            new = (job.suggestions or [])[sent:]
+            if new:
+                for row in await sync_to_async(_enhance_suggestions)(new):
+                    yield _sse('suggestion', row)
+                sent += len(new)
+                quiet = 0.0
+            if job.status == AIJob.DONE:
+                yield _sse('done', {'cache': job.source})
+                return
+            if job.status == AIJob.FAILED:
+                yield _sse('error', {'error': job.error})
+                return
+            if quiet >= JOB_EVENTS_KEEPALIVE:
+                # Keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                quiet = 0.0
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+            quiet += JOB_EVENTS_INTERVAL
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def consume_job_status(request: HttpRequest, job_id) -> JsonResponse:
+    """The state of a queued analysis; cheap enough to poll every second."""
+    job = AIJob.objects.only('id', 'status', 'error').filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': _('Analysis not found')}, status=404)
+    response = JsonResponse(_job_status(job))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def consume_job_result(request: HttpRequest, job_id) -> JsonResponse:
+    """The suggestions of a finished analysis with the current inventory data, like ``consume_view``."""
+    job = AIJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': _('Analysis not found')}, status=404)
+    if job.status == AIJob.FAILED:
+        return JsonResponse({'error': job.error}, status=job.error_status or 500)
+    if job.status != AIJob.DONE:
+        return JsonResponse({'error': _('The analysis is not finished yet')}, status=409)
+    response = JsonResponse({'success': True, 'suggestions': _enhance_suggestions(job.suggestions)})
+    response['X-AI-Cache'] = job.source
+    return response
 
 
 @csrf_exempt
 def apply_consume_changes(request: HttpRequest) -> JsonResponse:
-    """Apply the finalized consumption changes to inventory."""
+    """Apply the finalized consumption changes to inventory in one transaction.
+
+    Each change is applied relative to the quantity the client saw, see
+    ``quantities.parse_change``. The response lists every updated item and
+    the changes that were skipped with the reason.
+    """
     if request.method != "POST":
         return JsonResponse({'error': _('Method not allowed')}, status=405)
     
     try:
-        import json
         data = json.loads(request.body)
         changes = data.get('changes', [])
         
         if not changes:
             return JsonResponse({'error': _('No changes to apply')}, status=400)
         
-        updated_items = []
-        
-        # Apply each change
+        parsed = []
+        skipped = []
         for change in changes:
             try:
-                item_id = change.get('id')
-                new_quantity = change.get('suggested_new_quantity', 0)
-                
-                if item_id is None or new_quantity < 0:
-                    continue
-                
-                # Get and update the item
-                item = Item.objects.get(id=item_id)
-                old_quantity = item.current_quantity
-                item.current_quantity = new_quantity
-                item.save()
-                
-                updated_items.append({
-                    'id': item.id,
-                    'name': item.name,
-                    'old_quantity': old_quantity,
-                    'new_quantity': new_quantity
-                })
-                
-            except Item.DoesNotExist:
-                continue
-            except (KeyError, ValueError, TypeError):
-                continue
+                parsed.append(quantities.parse_change(change))
+            except (AttributeError, KeyError, ValueError, TypeError):
+                item_id = change.get('id') if isinstance(change, dict) else None
+                skipped.append({'id': item_id, 'reason': 'invalid'})
+        
+        updated_items, missing = quantities.apply(parsed)
+        skipped.extend({'id': item_id, 'reason': 'not_found'} for item_id in missing)
         
         return JsonResponse({
             'success': True,
             'message': _('Inventory updated successfully'),
-            'updated_items': updated_items
+            'updated_items': updated_items,
+            'skipped': skipped,
         })
         
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, AttributeError):
         return JsonResponse({'error': _('Invalid request format')}, status=400)
     except Exception as e:
         return JsonResponse({'error': _('An error occurred while updating inventory')}, status=500)